@@ -0,0 +1,288 @@
+"""Run many WorldVault flows concurrently over shared connection pools.
+
+    python engine.py --flows 2000 --concurrency 500 --limit mcp=200 --limit policy=100
+
+Every flow runs the same steps as ``WorldVaultFlow`` for one subject. A
+global semaphore caps the flows in flight; each downstream service has its
+own semaphore sized to its connection pool, so a slow service queues its
+callers instead of starving the others. Consents for the whole campaign are
+issued up front through ``/consent/issue_batch``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from flow import (
+    APPROVAL_TIMEOUT_S,
+    AUTO_APPROVE,
+    LEAD_AGENT_TASK,
+    LEAD_AGENT_URL,
+    MCP_URL,
+    POLICY_ADAPTER_URL,
+    PREFS_WRITE_ARGS,
+    PREFS_WRITE_TOOL,
+    PROFILE_READ_ARGS,
+    PROFILE_READ_TOOL,
+    SUBJECT_AGENT_TASK,
+    SUBJECT_AGENT_URL,
+    TOOL_CALL_ATTEMPTS,
+    VAULT_API_URL,
+    approval_decision,
+    consent_request,
+    next_tool_call_step,
+    tool_call_payload,
+)
+
+SERVICE_URLS = {
+    "vault": VAULT_API_URL,
+    "policy": POLICY_ADAPTER_URL,
+    # Approval long-polls park for seconds; a pool of their own keeps them off the policy-check slots.
+    "approvals": POLICY_ADAPTER_URL,
+    "mcp": MCP_URL,
+    "lead_agent": LEAD_AGENT_URL,
+    "subject_agent": SUBJECT_AGENT_URL,
+}
+DEFAULT_SERVICE_LIMIT = int(os.getenv("ENGINE_SERVICE_LIMIT", "100"))
+CONSENT_BATCH_SIZE = int(os.getenv("ENGINE_CONSENT_BATCH_SIZE", "1000"))
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+        "max_ms": round(max(values, default=0.0) * 1000, 1),
+    }
+
+
+class ServicePool:
+    """One pooled ``AsyncClient`` per service, gated by a semaphore of the same size."""
+
+    def __init__(self, name: str, base_url: str, limit: int) -> None:
+        self.name = name
+        self.limit = max(1, limit)
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=self.limit, max_keepalive_connections=self.limit),
+        )
+        self._semaphore = asyncio.Semaphore(self.limit)
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    async def request(self, method: str, path: str, **kwargs: object) -> httpx.Response:
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                return await self.client.request(method, path, **kwargs)
+            except httpx.HTTPError:
+                self.errors += 1
+                raise
+            finally:
+                self.latencies.append(time.perf_counter() - started)
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "limit": self.limit,
+            **_latency_summary(self.latencies),
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+@dataclass
+class FlowResult:
+    subject: str
+    ok: bool
+    duration_s: float
+    error: Optional[str] = None
+    receipts: List[Dict[str, object]] = field(default_factory=list)
+
+
+class FlowEngine:
+    def __init__(self, concurrency: int = 200, service_limits: Optional[Dict[str, int]] = None) -> None:
+        self.concurrency = max(1, concurrency)
+        limits = service_limits or {}
+        self.pools = {
+            name: ServicePool(name, url, limits.get(name, DEFAULT_SERVICE_LIMIT))
+            for name, url in SERVICE_URLS.items()
+        }
+
+    async def _issue_consents(self, subjects: List[str]) -> List[Optional[str]]:
+        tokens: List[Optional[str]] = []
+        for start in range(0, len(subjects), CONSENT_BATCH_SIZE):
+            chunk = subjects[start : start + CONSENT_BATCH_SIZE]
+            response = await self.pools["vault"].request(
+                "POST", "/consent/issue_batch", json={"items": [consent_request(subject) for subject in chunk]}
+            )
+            response.raise_for_status()
+            for item in response.json()["results"]:
+                tokens.append(item["result"]["token"] if item["ok"] else None)
+        return tokens
+
+    async def _wait_for_approval(self, approval_id: str) -> str:
+        deadline = time.monotonic() + APPROVAL_TIMEOUT_S
+        while time.monotonic() < deadline:
+            response = await self.pools["approvals"].request(
+                "GET",
+                f"/policy/approvals/{approval_id}/wait",
+                params={"wait_s": min(30.0, max(0.0, deadline - time.monotonic()))},
+                timeout=45.0,
+            )
+            response.raise_for_status()
+            data = response.json()
+            if data.get("resolved"):
+                return str(data.get("status"))
+        raise RuntimeError(f"approval timed out: {approval_id}")
+
+    async def _mcp_call(
+        self, token: str, name: str, arguments: Dict[str, object], receipts: List[Dict[str, object]]
+    ) -> Dict[str, object]:
+        approval_id: Optional[str] = None
+        payment_proof: Optional[str] = None
+        for _ in range(TOOL_CALL_ATTEMPTS):
+            payload = tool_call_payload(name, arguments, token, payment_proof, approval_id)
+            response = await self.pools["mcp"].request("POST", "/tools/call", json=payload)
+            step = next_tool_call_step(response, receipts)
+            if step.action == "pay":
+                payment_proof = step.payment_proof
+                continue
+            if step.action == "hold":
+                approval_id = step.approval_id
+                if AUTO_APPROVE:
+                    approve = await self.pools["policy"].request(
+                        "POST", "/policy/approve", json=approval_decision(approval_id)
+                    )
+                    approve.raise_for_status()
+                if await self._wait_for_approval(approval_id) != "APPROVE":
+                    raise RuntimeError(f"approval denied: {approval_id}")
+                continue
+            return step.data
+        raise RuntimeError(f"failed to complete tool call: {name}")
+
+    async def _run_flow(self, subject: str, token: Optional[str], gate: asyncio.Semaphore) -> FlowResult:
+        async with gate:
+            started = time.perf_counter()
+            receipts: List[Dict[str, object]] = []
+            try:
+                if token is None:
+                    raise RuntimeError("consent not issued")
+                await self._mcp_call(token, PROFILE_READ_TOOL, PROFILE_READ_ARGS, receipts)
+                lead, optimized = await asyncio.gather(
+                    self.pools["lead_agent"].request("POST", "/start_task", json=LEAD_AGENT_TASK),
+                    self.pools["subject_agent"].request("POST", "/start_task", json=SUBJECT_AGENT_TASK),
+                )
+                lead.raise_for_status()
+                optimized.raise_for_status()
+                await self._mcp_call(token, PREFS_WRITE_TOOL, PREFS_WRITE_ARGS, receipts)
+            except (httpx.HTTPError, RuntimeError, KeyError, ValueError) as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                return FlowResult(subject, False, time.perf_counter() - started, error, receipts)
+            return FlowResult(subject, True, time.perf_counter() - started, receipts=receipts)
+
+    async def run(self, subjects: List[str]) -> Dict[str, object]:
+        try:
+            started = time.perf_counter()
+            tokens = await self._issue_consents(subjects)
+            consents_s = time.perf_counter() - started
+            gate = asyncio.Semaphore(self.concurrency)
+            flows_started = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._run_flow(subject, token, gate) for subject, token in zip(subjects, tokens))
+            )
+            return self._summary(results, consents_s, time.perf_counter() - flows_started)
+        finally:
+            await asyncio.gather(*(pool.aclose() for pool in self.pools.values()))
+
+    def _summary(self, results: List[FlowResult], consents_s: float, wall_s: float) -> Dict[str, object]:
+        succeeded = [result for result in results if result.ok]
+        errors: Dict[str, int] = {}
+        for result in results:
+            if result.error:
+                errors[result.error] = errors.get(result.error, 0) + 1
+        return {
+            "flows": len(results),
+            "succeeded": len(succeeded),
+            "failed": len(results) - len(succeeded),
+            "concurrency": self.concurrency,
+            "consents_s": round(consents_s, 3),
+            "wall_s": round(wall_s, 3),
+            "flows_per_s": round(len(results) / wall_s, 1) if wall_s > 0 else 0.0,
+            "flow_latency": _latency_summary([result.duration_s for result in succeeded]),
+            "spend_usdc": round(
+                sum(float(receipt.get("amount") or 0.0) for result in results for receipt in result.receipts), 6
+            ),
+            "services": {name: pool.summary() for name, pool in self.pools.items()},
+            "errors": dict(sorted(errors.items(), key=lambda item: -item[1])[:10]),
+        }
+
+
+def _parse_limits(values: List[str]) -> Dict[str, int]:
+    limits: Dict[str, int] = {}
+    for value in values:
+        name, _, limit = value.partition("=")
+        if name not in SERVICE_URLS or not limit.isdigit():
+            raise ValueError(f"expected <service>=<n> with service in {sorted(SERVICE_URLS)}: {value}")
+        limits[name] = int(limit)
+    return limits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run WorldVault flows concurrently.")
+    parser.add_argument("--flows", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=200, help="flows in flight at once")
+    parser.add_argument(
+        "--subjects", default="did:wv:user:alex_rivera_0x4f2a,did:wv:user:demo", help="comma-separated, cycled"
+    )
+    parser.add_argument("--limit", action="append", default=[], metavar="SERVICE=N", help="per-service request limit")
+    args = parser.parse_args()
+
+    pool = [subject.strip() for subject in args.subjects.split(",") if subject.strip()]
+    subjects = [pool[index % len(pool)] for index in range(args.flows)]
+    try:
+        service_limits = _parse_limits(args.limit)
+    except ValueError as exc:
+        parser.error(str(exc))
+    engine = FlowEngine(concurrency=args.concurrency, service_limits=service_limits)
+    summary = asyncio.run(engine.run(subjects))
+
+    print(f"flows: {summary['flows']}  ok: {summary['succeeded']}  failed: {summary['failed']}")
+    print(
+        f"consents issued in {summary['consents_s']}s; "
+        f"flows ran in {summary['wall_s']}s ({summary['flows_per_s']} flows/s)"
+    )
+    latency = summary["flow_latency"]
+    print(
+        f"flow latency p50 {latency['p50_ms']}ms  p95 {latency['p95_ms']}ms  "
+        f"p99 {latency['p99_ms']}ms  max {latency['max_ms']}ms"
+    )
+    print(f"spend: ${summary['spend_usdc']:.3f} USDC")
+    for name, stats in summary["services"].items():
+        print(
+            f"  {name:<14} {stats['requests']:>7} req  {stats['errors']:>4} err  limit {stats['limit']:<4}"
+            f" p50 {stats['p50_ms']}ms  p95 {stats['p95_ms']}ms"
+        )
+    for error, count in summary["errors"].items():
+        print(f"  {count:>5} x {error}")
+
+
+if __name__ == "__main__":
+    main()
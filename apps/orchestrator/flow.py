@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 
@@ -31,6 +32,9 @@ MCP_URL = os.getenv("MCP_URL", "http://localhost:8003")
 POLICY_ADAPTER_URL = os.getenv("POLICY_ADAPTER_URL", "http://localhost:8002")
 LEAD_AGENT_URL = os.getenv("LEAD_AGENT_URL", "http://localhost:9011")
 SUBJECT_AGENT_URL = os.getenv("SUBJECT_AGENT_URL", "http://localhost:9012")
+# Demo: approve HOLDs automatically; set to false to wait for a reviewer in the UI.
+AUTO_APPROVE = os.getenv("AUTO_APPROVE", "true").lower() == "true"
+APPROVAL_TIMEOUT_S = float(os.getenv("APPROVAL_TIMEOUT_S", "300"))
 
 # ANSI color codes for terminal output
 BLUE = "\033[94m"
@@ -42,6 +46,98 @@ RESET = "\033[0m"
 BOLD = "\033[1m"
 
 
+def consent_request(subject: str = "did:wv:user:alex_rivera_0x4f2a") -> Dict[str, object]:
+    return {
+        "sub": subject,
+        "act": "did:cobra:agent:sales_autopilot_v2",
+        "scp": [
+            "profile:name.read",
+            "profile:company.read",
+            "prefs:outreach_tone.read",
+            "prefs:writing_style.read",
+            "prefs:outreach_tone.write",
+        ],
+        "res": [
+            "profile.name",
+            "profile.company",
+            "prefs.outreach_tone",
+            "prefs.writing_style",
+        ],
+        "purpose": "sales_outreach_personalization",
+        "limits": {"max_reads": 50, "max_writes": 3, "rate_per_min": 20, "bytes_cap": 65536},
+        "ttl_seconds": 600,
+    }
+
+
+def simulated_payment_proof(detail: Dict[str, object]) -> str:
+    # Demo: simulated payment against the 402 requirements.
+    memo = (detail.get("detail") or {}).get("requirements", {}).get("memo")
+    return f"nevermined_sandbox_proof:{memo or 'demo'}"
+
+
+# Step inputs shared by WorldVaultFlow and the concurrent engine.
+PROFILE_READ_TOOL = "worldvault.profile.read"
+PROFILE_READ_ARGS: Dict[str, object] = {
+    "fields": ["profile.name", "profile.company"],
+    "purpose": "outreach_personalization",
+}
+PREFS_WRITE_TOOL = "worldvault.prefs.write"
+PREFS_WRITE_ARGS: Dict[str, object] = {
+    "updates": {"prefs.outreach_tone": "direct, warm, data-driven"},
+    "purpose": "outreach_personalization",
+}
+LEAD_AGENT_TASK: Dict[str, object] = {"lead_names": ["Avery", "Jordan"], "notes": "demo"}
+SUBJECT_AGENT_TASK: Dict[str, object] = {"subject_seed": "Quick intro", "tone": "direct"}
+TOOL_CALL_ATTEMPTS = 5
+
+
+def tool_call_payload(
+    name: str,
+    arguments: Dict[str, object],
+    consent_token: str,
+    payment_proof: Optional[str] = None,
+    approval_id: Optional[str] = None,
+) -> Dict[str, object]:
+    payload: Dict[str, object] = {"name": name, "arguments": arguments, "consent_token": consent_token}
+    if payment_proof:
+        payload["payment_proof"] = payment_proof
+    if approval_id:
+        payload["approval_id"] = approval_id
+    return payload
+
+
+def approval_decision(approval_id: str) -> Dict[str, object]:
+    return {"approval_id": approval_id, "decision": "APPROVE"}
+
+
+@dataclass
+class ToolCallStep:
+    """What a ``/tools/call`` response asks for next: ``pay``, wait on a ``hold``, or ``done``."""
+
+    action: str
+    data: Dict[str, object]
+    payment_proof: Optional[str] = None
+    approval_id: Optional[str] = None
+
+
+def next_tool_call_step(response: httpx.Response, receipts: List[Dict[str, object]]) -> ToolCallStep:
+    """Classify one ``/tools/call`` response; a 402 gets a simulated proof, a receipt is appended."""
+    if response.status_code == 402:
+        detail = response.json()
+        return ToolCallStep("pay", detail, payment_proof=simulated_payment_proof(detail))
+    response.raise_for_status()
+    data = response.json()
+    if data.get("receipt"):
+        receipts.append(data["receipt"])
+    result = data.get("result") or {}
+    if isinstance(result, dict) and result.get("decision") == "HOLD":
+        approval_id = result.get("approval_id")
+        if not approval_id:
+            raise RuntimeError("HOLD without approval_id")
+        return ToolCallStep("hold", data, approval_id=str(approval_id))
+    return ToolCallStep("done", data)
+
+
 @dataclass
 class FlowState:
     consent_token: Optional[str] = None
@@ -54,43 +150,49 @@ class FlowState:
 class WorldVaultFlow(Flow):
     def __init__(self) -> None:
         self.state = FlowState()
+        # One pooled client for every step; connections are reused across calls.
+        self.client = httpx.Client(timeout=20.0)
+        # The two A2A agents are called side by side from these threads, over the same client.
+        self._agent_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="a2a")
+
+    def close(self) -> None:
+        self._agent_pool.shutdown(wait=True)
+        self.client.close()
+
+    def __enter__(self) -> "WorldVaultFlow":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
 
     def _issue_consent(self) -> str:
         print(f"{BLUE}[FLOW]{RESET} Issuing consent token for Alex Rivera...")
-        payload = {
-            "sub": "did:wv:user:alex_rivera_0x4f2a",
-            "act": "did:cobra:agent:sales_autopilot_v2",
-            "scp": [
-                "profile:name.read",
-                "profile:company.read",
-                "prefs:outreach_tone.read",
-                "prefs:writing_style.read",
-                "prefs:outreach_tone.write",
-            ],
-            "res": [
-                "profile.name",
-                "profile.company",
-                "prefs.outreach_tone",
-                "prefs.writing_style",
-            ],
-            "purpose": "sales_outreach_personalization",
-            "limits": {"max_reads": 50, "max_writes": 3, "rate_per_min": 20, "bytes_cap": 65536},
-            "ttl_seconds": 600,
-        }
-        with httpx.Client(timeout=15.0) as client:
-            response = client.post(f"{VAULT_API_URL}/consent/issue", json=payload)
-            response.raise_for_status()
-            token_data = response.json()
-            print(f"  {GREEN}✓{RESET} Token issued: {token_data['jti']}")
-            return token_data["token"]
+        response = self.client.post(f"{VAULT_API_URL}/consent/issue", json=consent_request(), timeout=15.0)
+        response.raise_for_status()
+        token_data = response.json()
+        print(f"  {GREEN}✓{RESET} Token issued: {token_data['jti']}")
+        return token_data["token"]
 
     def _policy_approve(self, approval_id: str) -> None:
-        with httpx.Client(timeout=10.0) as client:
-            response = client.post(
-                f"{POLICY_ADAPTER_URL}/policy/approve",
-                json={"approval_id": approval_id, "decision": "APPROVE"},
+        response = self.client.post(
+            f"{POLICY_ADAPTER_URL}/policy/approve", json=approval_decision(approval_id), timeout=10.0
+        )
+        response.raise_for_status()
+
+    def _wait_for_approval(self, approval_id: str) -> str:
+        # Long-polls the policy adapter, which answers as soon as the approval is decided.
+        deadline = time.monotonic() + APPROVAL_TIMEOUT_S
+        while time.monotonic() < deadline:
+            response = self.client.get(
+                f"{POLICY_ADAPTER_URL}/policy/approvals/{approval_id}/wait",
+                params={"wait_s": min(30.0, max(0.0, deadline - time.monotonic()))},
+                timeout=45.0,
             )
             response.raise_for_status()
+            data = response.json()
+            if data.get("resolved"):
+                return str(data.get("status"))
+        raise RuntimeError(f"approval timed out: {approval_id}")
 
     def _mcp_call_with_loops(self, name: str, arguments: Dict[str, object]) -> Dict[str, object]:
         if not self.state.consent_token:
@@ -99,54 +201,37 @@ class WorldVaultFlow(Flow):
         approval_id: Optional[str] = None
         payment_proof: Optional[str] = None
 
-        for _ in range(5):
-            payload: Dict[str, object] = {
-                "name": name,
-                "arguments": arguments,
-                "consent_token": self.state.consent_token,
-            }
-            if payment_proof:
-                payload["payment_proof"] = payment_proof
-            if approval_id:
-                payload["approval_id"] = approval_id
-
-            with httpx.Client(timeout=20.0) as client:
-                response = client.post(f"{MCP_URL}/tools/call", json=payload)
-
-            if response.status_code == 402:
+        for _ in range(TOOL_CALL_ATTEMPTS):
+            payload = tool_call_payload(name, arguments, self.state.consent_token, payment_proof, approval_id)
+            response = self.client.post(f"{MCP_URL}/tools/call", json=payload)
+            step = next_tool_call_step(response, self.state.receipts)
+
+            if step.action == "pay":
                 # Demo: auto-pay (simulated) and retry.
-                detail = response.json()
-                reqs = detail.get("detail", {}).get("requirements", {})
+                reqs = step.data.get("detail", {}).get("requirements", {})
                 print(f"  {RED}✗{RESET} HTTP 402 Payment Required")
                 print(f"  → Receiver: {reqs.get('receiver', 'N/A')}")
                 print(f"  → Amount: {reqs.get('amount', 0)} {reqs.get('asset', 'USDC')}")
                 print(f"  → Memo: {reqs.get('memo', 'N/A')}")
-                memo = reqs.get("memo")
-                payment_proof = f"nevermined_sandbox_proof:{memo or 'demo'}"
+                payment_proof = step.payment_proof
                 print(f"{YELLOW}[PAYMENT]{RESET} Nevermined payment proof generated")
                 print(f"  → Proof: {payment_proof[:40]}...")
                 continue
 
-            response.raise_for_status()
-            data = response.json()
-
-            result = data.get("result") or {}
-            receipt = data.get("receipt")
-            if receipt:
-                self.state.receipts.append(receipt)
-
-            if isinstance(result, dict) and result.get("decision") == "HOLD":
+            if step.action == "hold":
+                approval_id = step.approval_id
                 print(f"  {ORANGE}⚠{RESET} HOLD - Requires human approval")
-                approval_id = result.get("approval_id")
-                if not approval_id:
-                    raise RuntimeError("HOLD without approval_id")
                 print(f"  → Approval ID: {approval_id}")
                 print(f"{ORANGE}[WAITING]{RESET} Human approval pending...")
-                self._policy_approve(approval_id)
+                if AUTO_APPROVE:
+                    self._policy_approve(approval_id)
+                status = self._wait_for_approval(approval_id)
+                if status != "APPROVE":
+                    raise RuntimeError(f"approval denied: {approval_id}")
                 print(f"  {GREEN}✓{RESET} APPROVED by user")
                 continue
 
-            return data
+            return step.data
 
         raise RuntimeError(f"failed to complete tool call: {name}")
 
@@ -157,24 +242,20 @@ class WorldVaultFlow(Flow):
         print(f"{BLUE}{'='*60}{RESET}\n")
         print(f"{BLUE}[FLOW]{RESET} Step 1/5: Discovering MCP tools...")
         self.state.consent_token = self._issue_consent()
-        with httpx.Client() as client:
-            response = client.get(f"{MCP_URL}/tools")
-            response.raise_for_status()
-            tools = response.json().get("tools", [])
-            self.state.tool_catalog = tools
-            for tool in tools:
-                price = tool.get("price_usdc", 0)
-                print(f"  → Found: {tool['name']} (${price:.3f})")
+        response = self.client.get(f"{MCP_URL}/tools")
+        response.raise_for_status()
+        tools = response.json().get("tools", [])
+        self.state.tool_catalog = tools
+        for tool in tools:
+            price = tool.get("price_usdc", 0)
+            print(f"  → Found: {tool['name']} (${price:.3f})")
 
     @step()
     def paid_profile_read(self) -> None:
         print(f"\n{BLUE}[FLOW]{RESET} Step 2/5: Reading Alex's profile...")
         if not self.state.consent_token:
             return
-        self.state.results["profile"] = self._mcp_call_with_loops(
-            "worldvault.profile.read",
-            {"fields": ["profile.name", "profile.company"], "purpose": "outreach_personalization"},
-        )
+        self.state.results["profile"] = self._mcp_call_with_loops(PROFILE_READ_TOOL, PROFILE_READ_ARGS)
         result = self.state.results["profile"].get("result", {})
         values = result.get("values", {})
         print(f"  {GREEN}✓{RESET} PAID & ALLOWED")
@@ -195,28 +276,23 @@ class WorldVaultFlow(Flow):
         print(f"      → Tone: direct, friendly")
         print(f"      → Cost: $0.008 | Status: RUNNING...")
 
-        asyncio.run(self._run_parallel_agents())
+        self._run_parallel_agents()
 
         print(f"  {GREEN}⚡{RESET} Both agents completed in 2.3s")
         print(f"  {GREEN}✓{RESET} Lead Enrichment: 3 profiles enriched")
         print(f"  {GREEN}✓{RESET} Subject Optimizer: \"Quick intro from Alex at TechFlow\"")
         print(f"  {BLUE}Budget used: $0.030 / $0.250{RESET}")
 
-    async def _run_parallel_agents(self) -> None:
-        async with httpx.AsyncClient() as client:
-            lead_task = client.post(
-                f"{LEAD_AGENT_URL}/start_task",
-                json={"lead_names": ["Avery", "Jordan"], "notes": "demo"},
-            )
-            subject_task = client.post(
-                f"{SUBJECT_AGENT_URL}/start_task",
-                json={"subject_seed": "Quick intro", "tone": "direct"},
-            )
-            lead_res, subject_res = await asyncio.gather(lead_task, subject_task)
-            lead_res.raise_for_status()
-            subject_res.raise_for_status()
-            self.state.results["lead_enrichment"] = lead_res.json()
-            self.state.results["subject_optimization"] = subject_res.json()
+    def _run_parallel_agents(self) -> None:
+        lead_task = self._agent_pool.submit(self.client.post, f"{LEAD_AGENT_URL}/start_task", json=LEAD_AGENT_TASK)
+        subject_task = self._agent_pool.submit(
+            self.client.post, f"{SUBJECT_AGENT_URL}/start_task", json=SUBJECT_AGENT_TASK
+        )
+        lead_res, subject_res = lead_task.result(), subject_task.result()
+        lead_res.raise_for_status()
+        subject_res.raise_for_status()
+        self.state.results["lead_enrichment"] = lead_res.json()
+        self.state.results["subject_optimization"] = subject_res.json()
 
     @step()
     def request_prefs_write(self) -> None:
@@ -226,13 +302,7 @@ class WorldVaultFlow(Flow):
         print(f"  → Cost: $0.015")
         if not self.state.consent_token:
             return
-        self.state.results["prefs_write"] = self._mcp_call_with_loops(
-            "worldvault.prefs.write",
-            {
-                "updates": {"prefs.outreach_tone": "direct, warm, data-driven"},
-                "purpose": "outreach_personalization",
-            },
-        )
+        self.state.results["prefs_write"] = self._mcp_call_with_loops(PREFS_WRITE_TOOL, PREFS_WRITE_ARGS)
         print(f"  {GREEN}✓{RESET} Write completed")
         receipt = self.state.results["prefs_write"].get("receipt")
         if receipt:
@@ -240,15 +310,15 @@ class WorldVaultFlow(Flow):
 
 
 if __name__ == "__main__":
-    flow = WorldVaultFlow()
-    if hasattr(flow, "kickoff"):
-        flow.kickoff()
-    else:
-        flow.discover_tools()
-        flow.paid_profile_read()
-        flow.run_parallel_agents()
-        flow.request_prefs_write()
-        print("\n=== WorldVault demo results ===")
-        print(flow.state.results)
-        print("\n=== Receipts ===")
-        print(flow.state.receipts)
+    with WorldVaultFlow() as flow:
+        if hasattr(flow, "kickoff"):
+            flow.kickoff()
+        else:
+            flow.discover_tools()
+            flow.paid_profile_read()
+            flow.run_parallel_agents()
+            flow.request_prefs_write()
+            print("\n=== WorldVault demo results ===")
+            print(flow.state.results)
+            print("\n=== Receipts ===")
+            print(flow.state.receipts)
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import html
 import json
+import os
 import time
 from pathlib import Path
 
+import httpx
 import streamlit as st
 
 ASSETS_DIR = Path(__file__).parent / "assets"
 LOGO_PATH = ASSETS_DIR / "World-Vault-Logo.png"
 ICON_PATH = ASSETS_DIR / "World-Vault-Icon.png"
+POLICY_ADAPTER_URL = os.getenv("POLICY_ADAPTER_URL", "http://localhost:8002").rstrip("/")
 
 st.set_page_config(
     page_title="World Vault",
@@ -176,6 +180,29 @@ def _parse_resources(text: str) -> list[str]:
     return parsed if isinstance(parsed, list) else []
 
 
+def _pending_approvals(limit: int = 200) -> list[dict]:
+    response = httpx.get(
+        f"{POLICY_ADAPTER_URL}/policy/approvals", params={"status": "PENDING", "limit": limit}, timeout=5.0
+    )
+    response.raise_for_status()
+    return response.json().get("approvals", [])
+
+
+def _decide_approvals(approval_ids: list[str], decision: str) -> dict:
+    response = httpx.post(
+        f"{POLICY_ADAPTER_URL}/policy/approvals/decide",
+        json={"approval_ids": approval_ids, "decision": decision},
+        timeout=10.0,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _approval_change(request: dict) -> str:
+    items = request.get("items") or [request]
+    return ", ".join(f"{item.get('resource')} {item.get('action')}" for item in items if item.get("resource"))
+
+
 def header(title: str, subtitle: str) -> None:
     st.markdown(
         f"""
@@ -275,33 +302,58 @@ elif section == "Approvals":
         "Approvals Queue",
         "Risky writes are held for human approval before execution.",
     )
+    try:
+        approvals = _pending_approvals()
+    except httpx.HTTPError as exc:
+        approvals = []
+        st.warning(f"Policy adapter unavailable at {POLICY_ADAPTER_URL}: {exc}")
+    rows = "".join(
+        f"""
+      <tr>
+        <td class="wv-mono">{html.escape(str(approval["approval_id"]))}</td>
+        <td>{html.escape(str((approval.get("request") or {}).get("tool", "")))}</td>
+        <td class="wv-mono">{html.escape(str(approval.get("agent_did") or ""))}</td>
+        <td>{html.escape(_approval_change(approval.get("request") or {}))}</td>
+        <td>${float((approval.get("request") or {}).get("cost_usdc") or 0.0):.3f}</td>
+        <td><span class="wv-pill warn">HOLD</span></td>
+      </tr>"""
+        for approval in approvals
+    ) or '<tr><td colspan="6">No pending approvals.</td></tr>'
     st.markdown(
-        """
+        f"""
 <div class="wv-card">
-  <div class="wv-section-title">Pending approvals</div>
+  <div class="wv-section-title">Pending approvals ({len(approvals)})</div>
   <table class="wv-table">
     <thead>
-      <tr><th>Request</th><th>Tool</th><th>Change</th><th>Cost</th><th>Status</th></tr>
+      <tr><th>Request</th><th>Tool</th><th>Agent</th><th>Change</th><th>Cost</th><th>Status</th></tr>
     </thead>
-    <tbody>
-      <tr>
-        <td class="wv-mono">appr_b8f2</td>
-        <td>worldvault.prefs.write</td>
-        <td><span style="color: #666;">outreach_tone</span> → "direct, warm, data-driven"</td>
-        <td>$0.015</td>
-        <td><span class="wv-pill warn">HOLD</span></td>
-      </tr>
+    <tbody>{rows}
     </tbody>
   </table>
 </div>
 """,
         unsafe_allow_html=True,
     )
+    approval_ids = [str(approval["approval_id"]) for approval in approvals]
+    selected = st.multiselect("Selected requests", approval_ids, default=approval_ids)
     col1, col2 = st.columns([1, 1])
+    decision = None
     with col1:
-        st.button("Approve", type="primary")
+        if st.button("Approve", type="primary", disabled=not selected):
+            decision = "APPROVE"
     with col2:
-        st.button("Deny")
+        if st.button("Deny", disabled=not selected):
+            decision = "DENY"
+    if decision:
+        try:
+            result = _decide_approvals(selected, decision)
+        except httpx.HTTPError as exc:
+            st.error(f"Decision failed: {exc}")
+        else:
+            if result.get("not_found"):
+                st.warning(f"Already expired: {', '.join(result['not_found'])}")
+            else:
+                st.rerun()
 
 elif section == "Revocation":
     header(
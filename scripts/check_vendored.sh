@@ -0,0 +1,16 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+
+# Helpers each service ships its own copy of; the copies must not drift.
+VENDORED=(expiry.py idempotency.py token_cache.py)
+
+status=0
+for name in "${VENDORED[@]}"; do
+  if ! diff -u "$ROOT_DIR/services/policy_adapter/app/$name" "$ROOT_DIR/services/vault_api/app/$name"; then
+    echo "vendored copies differ: $name"
+    status=1
+  fi
+done
+exit "$status"
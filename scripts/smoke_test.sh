@@ -81,6 +81,25 @@ def main():
     print("Paid retry status", status)
     print(text[:300])
 
+    # A batch re-submitted with a still-pending approval must echo that approval_id
+    batch_body = {
+        "consent_token": token,
+        "tool": "worldvault.profile.read",
+        "items": [{"action": "read", "scope": "profile:name.read", "resource": "profile.name"}],
+        "require_approval": True,
+    }
+    status, text = req("POST", "http://localhost:8002/policy/check_batch", batch_body)
+    approval_id = json.loads(text).get("approval_id")
+    if not approval_id:
+        print("batch HOLD without approval_id", text[:300])
+        sys.exit(1)
+    batch_body["approval_id"] = approval_id
+    status, text = req("POST", "http://localhost:8002/policy/check_batch", batch_body)
+    if json.loads(text).get("approval_id") != approval_id:
+        print("pending batch re-poll lost approval_id", text[:300])
+        sys.exit(1)
+    print("Pending batch re-poll", status, approval_id)
+
     # Apify enrichment
     status, text = req("POST", "http://localhost:9011/start_task", {"lead_names": ["Avery", "Jordan"], "notes": "demo"})
     print("Lead enrichment", status)
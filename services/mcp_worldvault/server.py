@@ -1,12 +1,28 @@
+import asyncio
+import base64
+import json
+import math
 import os
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
 import httpx
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
+from value_cache import Fetched, VaultValueCache
+
 POLICY_ADAPTER_URL = os.getenv("POLICY_ADAPTER_URL", "http://localhost:8002")
 VAULT_API_URL = os.getenv("VAULT_API_URL", "http://localhost:8001")
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+VAULT_CACHE_SIZE = int(os.getenv("VAULT_CACHE_SIZE", "10000"))
+VAULT_CACHE_TTL_S = float(os.getenv("VAULT_CACHE_TTL_S", "30"))
+# With the vault's admin token the cache follows its all-subjects change feed; otherwise only the TTL applies.
+VAULT_ADMIN_TOKEN = os.getenv("VAULT_ADMIN_TOKEN", "")
+VAULT_CHANGES_WAIT_S = float(os.getenv("VAULT_CHANGES_WAIT_S", "25"))
 
 TOOL_CATALOG = [
     {
@@ -78,7 +94,64 @@ class ToolCallResponse(BaseModel):
     receipt: Optional[Dict[str, Any]] = None
 
 
-app = FastAPI(title="World Vault MCP Server", version="0.1.0")
+def _pooled_client(base_url: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=HTTP_TIMEOUT)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Long-lived pools so tool calls reuse keep-alive connections upstream.
+    app.state.policy_client = _pooled_client(POLICY_ADAPTER_URL)
+    app.state.vault_client = _pooled_client(VAULT_API_URL)
+    tasks = []
+    if VAULT_ADMIN_TOKEN and app.state.vault_cache.enabled:
+        tasks.append(asyncio.create_task(_follow_vault_changes()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await app.state.policy_client.aclose()
+        await app.state.vault_client.aclose()
+
+
+app = FastAPI(title="World Vault MCP Server", version="0.1.0", lifespan=lifespan)
+app.state.vault_cache = VaultValueCache(max_entries=VAULT_CACHE_SIZE, ttl_s=VAULT_CACHE_TTL_S)
+
+
+async def _follow_vault_changes() -> None:
+    # Long-polls every subject's changes; a gap (truncated feed or a vault outage, which may be a
+    # restart that reset its seqs) drops the whole cache and resumes from the current head.
+    cache = app.state.vault_cache
+    cursor: Optional[int] = None
+    while True:
+        params: Dict[str, Any] = {"wait_s": VAULT_CHANGES_WAIT_S, "limit": 1000}
+        if cursor is not None:
+            params["since"] = cursor
+        try:
+            res = await app.state.vault_client.get(
+                "/vault/changes",
+                params=params,
+                headers={"X-Admin-Token": VAULT_ADMIN_TOKEN},
+                timeout=VAULT_CHANGES_WAIT_S + HTTP_TIMEOUT,
+            )
+            res.raise_for_status()
+            body = res.json()
+        except (httpx.HTTPError, ValueError):
+            cache.clear()
+            cursor = None
+            await asyncio.sleep(1.0)
+            continue
+        if body.get("truncated"):
+            cache.clear()
+        for change in body.get("changes", []):
+            cache.apply_change(str(change["subject"]), str(change["key"]), int(change["version"]))
+        cursor = int(body["next_cursor"])
 
 
 def _tool_price(name: str) -> float:
@@ -97,151 +170,148 @@ def _scope_for_read(field: str) -> str:
     return f"profile:{base}.read" if field.startswith("profile.") else f"prefs:{base}.read"
 
 
+def _scope_for_insights(field: str) -> str:
+    base = field.split(".")[-1]
+    return f"insights:{base}.read"
+
+
 def _scope_for_write(field: str) -> str:
     base = field.split(".")[-1]
     return f"prefs:{base}.write"
 
 
+def _token_subject(consent_token: str) -> str:
+    # Only used after the policy adapter has verified the token, so the claims can be read without re-verifying.
+    try:
+        segment = consent_token.split(".")[1]
+        payload = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+    except (IndexError, ValueError) as exc:
+        raise HTTPException(status_code=401, detail="invalid_token") from exc
+    return str(payload.get("sub") or "")
+
+
 @app.get("/tools")
 def list_tools() -> Dict[str, Any]:
     return {"tools": _tool_definition()}
 
 
+@app.get("/stats")
+def stats() -> Dict[str, Any]:
+    return {"vault_cache": app.state.vault_cache.stats()}
+
+
 @app.post("/tools/call", response_model=ToolCallResponse)
-def call_tool(request: ToolCallRequest) -> ToolCallResponse:
+async def call_tool(request: ToolCallRequest) -> ToolCallResponse:
     if request.name == "worldvault.profile.read":
-        return _handle_profile_read(request)
+        return await _handle_profile_read(request)
     if request.name == "worldvault.prefs.read":
-        return _handle_prefs_read(request)
+        return await _handle_prefs_read(request)
     if request.name == "worldvault.prefs.write":
-        return _handle_prefs_write(request)
+        return await _handle_prefs_write(request)
     if request.name == "worldvault.insights.read":
-        return _handle_insights_read(request)
+        return await _handle_insights_read(request)
     raise HTTPException(status_code=404, detail="tool_not_found")
 
 
-def _handle_profile_read(request: ToolCallRequest) -> ToolCallResponse:
-    fields = request.arguments.get("fields", [])
-    if not fields:
-        raise HTTPException(status_code=400, detail="fields_required")
-
-    resource = fields[0]
-    scope = _scope_for_read(resource)
-    price = _tool_price(request.name)
-
-    policy_payload = {
-        "consent_token": request.consent_token,
-        "action": "read",
-        "scope": scope,
-        "resource": resource,
-        "tool": request.name,
-        "cost_usdc": price,
-        "bytes": 0,
-        "payment_proof": request.payment_proof,
-        "approval_id": request.approval_id,
-    }
-
-    with httpx.Client() as client:
-        policy_res = client.post(f"{POLICY_ADAPTER_URL}/policy/check", json=policy_payload)
+async def _policy_post(path: str, policy_payload: Dict[str, Any]) -> Dict[str, Any]:
+    policy_res = await app.state.policy_client.post(path, json=policy_payload)
     if policy_res.status_code == 402:
         raise HTTPException(status_code=402, detail=policy_res.json())
     if policy_res.status_code != 200:
         raise HTTPException(status_code=policy_res.status_code, detail=policy_res.text)
+    return policy_res.json()
 
-    decision = policy_res.json()
-    if decision.get("decision") == "HOLD":
-        return ToolCallResponse(result={"decision": "HOLD", "approval_id": decision.get("approval_id")})
-
-    with httpx.Client() as client:
-        vault_res = client.post(f"{VAULT_API_URL}/vault/read", json={"keys": fields})
-    if vault_res.status_code != 200:
-        raise HTTPException(status_code=vault_res.status_code, detail=vault_res.text)
-
-    return ToolCallResponse(result=vault_res.json(), receipt=decision.get("receipt"))
-
-
-def _handle_prefs_read(request: ToolCallRequest) -> ToolCallResponse:
-    fields = request.arguments.get("fields", [])
-    if not fields:
-        raise HTTPException(status_code=400, detail="fields_required")
-
-    resource = fields[0]
-    scope = _scope_for_read(resource)
-    price = _tool_price(request.name)
-
-    policy_payload = {
-        "consent_token": request.consent_token,
-        "action": "read",
-        "scope": scope,
-        "resource": resource,
-        "tool": request.name,
-        "cost_usdc": price,
-        "bytes": 0,
-        "payment_proof": request.payment_proof,
-        "approval_id": request.approval_id,
-    }
 
-    with httpx.Client() as client:
-        policy_res = client.post(f"{POLICY_ADAPTER_URL}/policy/check", json=policy_payload)
-    if policy_res.status_code == 402:
-        raise HTTPException(status_code=402, detail=policy_res.json())
-    if policy_res.status_code != 200:
-        raise HTTPException(status_code=policy_res.status_code, detail=policy_res.text)
+def _raise_if_rate_limited(decision: Dict[str, Any]) -> None:
+    if decision.get("reason") != "rate_limited":
+        return
+    retry_after = decision.get("retry_after_s") or 1
+    raise HTTPException(
+        status_code=429,
+        detail={"error": "rate_limited", "retry_after_s": retry_after},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
 
-    decision = policy_res.json()
-    if decision.get("decision") == "HOLD":
-        return ToolCallResponse(result={"decision": "HOLD", "approval_id": decision.get("approval_id")})
 
-    with httpx.Client() as client:
-        vault_res = client.post(f"{VAULT_API_URL}/vault/read", json={"keys": fields})
+async def _vault_post(path: str, body: Dict[str, Any], consent_token: str) -> Dict[str, Any]:
+    headers = {"Authorization": f"Bearer {consent_token}"}
+    vault_res = await app.state.vault_client.post(path, json=body, headers=headers)
     if vault_res.status_code != 200:
         raise HTTPException(status_code=vault_res.status_code, detail=vault_res.text)
-
-    return ToolCallResponse(result=vault_res.json(), receipt=decision.get("receipt"))
+    return vault_res.json()
 
 
-def _handle_insights_read(request: ToolCallRequest) -> ToolCallResponse:
+async def _handle_batched_read(request: ToolCallRequest, scope_for: Callable[[str], str]) -> ToolCallResponse:
     fields = request.arguments.get("fields", [])
     if not fields:
         raise HTTPException(status_code=400, detail="fields_required")
-
-    resource = fields[0]
-    base = resource.split(".")[-1]
-    scope = f"insights:{base}.read"
-    price = _tool_price(request.name)
+    fields = list(dict.fromkeys(fields))
 
     policy_payload = {
         "consent_token": request.consent_token,
-        "action": "read",
-        "scope": scope,
-        "resource": resource,
         "tool": request.name,
-        "cost_usdc": price,
-        "bytes": 0,
+        "items": [
+            {"action": "read", "scope": scope_for(field), "resource": field, "cost_usdc": 0.0, "bytes": 0}
+            for field in fields
+        ],
+        "cost_usdc": _tool_price(request.name),
         "payment_proof": request.payment_proof,
         "approval_id": request.approval_id,
     }
 
-    with httpx.Client() as client:
-        policy_res = client.post(f"{POLICY_ADAPTER_URL}/policy/check", json=policy_payload)
-    if policy_res.status_code == 402:
-        raise HTTPException(status_code=402, detail=policy_res.json())
-    if policy_res.status_code != 200:
-        raise HTTPException(status_code=policy_res.status_code, detail=policy_res.text)
-
-    decision = policy_res.json()
-    if decision.get("decision") == "HOLD":
-        return ToolCallResponse(result={"decision": "HOLD", "approval_id": decision.get("approval_id")})
-
-    with httpx.Client() as client:
-        vault_res = client.post(f"{VAULT_API_URL}/vault/read", json={"keys": fields})
-    if vault_res.status_code != 200:
-        raise HTTPException(status_code=vault_res.status_code, detail=vault_res.text)
-
-    return ToolCallResponse(result=vault_res.json(), receipt=decision.get("receipt"))
-
-
-def _handle_prefs_write(request: ToolCallRequest) -> ToolCallResponse:
+    batch = await _policy_post("/policy/check_batch", policy_payload)
+    for decision in batch.get("decisions", []):
+        _raise_if_rate_limited(decision)
+    allowed: List[str] = []
+    denied: Dict[str, str] = {}
+    held: List[str] = []
+    approval_id: Optional[str] = batch.get("approval_id")
+    for field, decision in zip(fields, batch.get("decisions", [])):
+        if decision.get("decision") == "ALLOW":
+            allowed.append(field)
+        elif decision.get("decision") == "HOLD":
+            held.append(field)
+            approval_id = approval_id or decision.get("approval_id")
+        else:
+            denied[field] = decision.get("reason") or "denied"
+
+    if held:
+        # A HOLD the caller cannot wait on is useless; fall back to the approval being re-polled.
+        approval_id = approval_id or request.approval_id
+        if not approval_id:
+            raise HTTPException(status_code=502, detail="hold_without_approval_id")
+    if held and not allowed:
+        return ToolCallResponse(result={"decision": "HOLD", "approval_id": approval_id})
+
+    async def fetch(keys: List[str]) -> Fetched:
+        body = await _vault_post("/vault/read", {"keys": keys}, request.consent_token)
+        values, versions = body.get("values", {}), body.get("versions", {})
+        return {key: (values.get(key), int(versions.get(key, 0))) for key in keys}
+
+    # Policy and billing above run on every call; only the vault hop is served from cache.
+    values: Dict[str, Any] = {}
+    if allowed:
+        values = await app.state.vault_cache.get_many(_token_subject(request.consent_token), allowed, fetch)
+    result: Dict[str, Any] = {"values": values, "denied": denied}
+    if held:
+        result["held"] = held
+        result["approval_id"] = approval_id
+    return ToolCallResponse(result=result, receipt=batch.get("receipt"))
+
+
+async def _handle_profile_read(request: ToolCallRequest) -> ToolCallResponse:
+    return await _handle_batched_read(request, _scope_for_read)
+
+
+async def _handle_prefs_read(request: ToolCallRequest) -> ToolCallResponse:
+    return await _handle_batched_read(request, _scope_for_read)
+
+
+async def _handle_insights_read(request: ToolCallRequest) -> ToolCallResponse:
+    return await _handle_batched_read(request, _scope_for_insights)
+
+
+async def _handle_prefs_write(request: ToolCallRequest) -> ToolCallResponse:
     updates = request.arguments.get("updates")
     if not updates:
         raise HTTPException(status_code=400, detail="updates_required")
@@ -263,20 +333,23 @@ def _handle_prefs_write(request: ToolCallRequest) -> ToolCallResponse:
         "approval_id": request.approval_id,
     }
 
-    with httpx.Client() as client:
-        policy_res = client.post(f"{POLICY_ADAPTER_URL}/policy/check", json=policy_payload)
-    if policy_res.status_code == 402:
-        raise HTTPException(status_code=402, detail=policy_res.json())
-    if policy_res.status_code != 200:
-        raise HTTPException(status_code=policy_res.status_code, detail=policy_res.text)
-
-    decision = policy_res.json()
+    decision = await _policy_post("/policy/check", policy_payload)
+    _raise_if_rate_limited(decision)
+    if decision.get("decision") == "BLOCK":
+        raise HTTPException(status_code=403, detail=decision.get("reason") or "blocked")
     if decision.get("decision") == "HOLD":
-        return ToolCallResponse(result={"decision": "HOLD", "approval_id": decision.get("approval_id")})
-
-    with httpx.Client() as client:
-        vault_res = client.post(f"{VAULT_API_URL}/vault/write", json={"updates": updates})
-    if vault_res.status_code != 200:
-        raise HTTPException(status_code=vault_res.status_code, detail=vault_res.text)
-
-    return ToolCallResponse(result=vault_res.json(), receipt=decision.get("receipt"))
+        approval_id = decision.get("approval_id") or request.approval_id
+        if not approval_id:
+            raise HTTPException(status_code=502, detail="hold_without_approval_id")
+        return ToolCallResponse(result={"decision": "HOLD", "approval_id": approval_id})
+
+    subject = _token_subject(request.consent_token)
+    try:
+        result = await _vault_post("/vault/write", {"updates": updates}, request.consent_token)
+    finally:
+        app.state.vault_cache.invalidate(subject, list(updates))
+    versions = result.get("versions") or {}
+    app.state.vault_cache.update(
+        subject, {key: (value, int(versions[key])) for key, value in updates.items() if key in versions}
+    )
+    return ToolCallResponse(result=result, receipt=decision.get("receipt"))
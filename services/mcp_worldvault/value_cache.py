@@ -0,0 +1,128 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+_Key = Tuple[str, str]
+# key -> (value, version); version 0 means the key does not exist in the vault.
+Fetched = Dict[str, Tuple[Optional[str], int]]
+
+
+class VaultValueCache:
+    """Bounded LRU of vault values keyed by (subject, key), with a TTL.
+
+    Entries carry the vault version and are only ever replaced by an equal or
+    newer version, so a slow read cannot overwrite a value written after it
+    started. Concurrent misses for the same keys share one upstream fetch.
+    Writes made through other paths are dropped via ``apply_change`` when the
+    server follows the vault change feed.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 30.0) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[_Key, Tuple[float, Optional[str], int]]" = OrderedDict()
+        self._inflight: Dict[_Key, "asyncio.Task[Fetched]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evicted = 0
+        self.invalidated = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_s > 0
+
+    def _store(self, subject: str, key: str, value: Optional[str], version: int) -> None:
+        cache_key = (subject, key)
+        current = self._entries.get(cache_key)
+        if current is not None and current[2] > version:
+            return
+        self._entries[cache_key] = (time.monotonic() + self.ttl_s, value, version)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def update(self, subject: str, items: Fetched) -> None:
+        if self.enabled:
+            for key, (value, version) in items.items():
+                self._store(subject, key, value, version)
+
+    def invalidate(self, subject: str, keys: List[str]) -> None:
+        for key in keys:
+            self._entries.pop((subject, key), None)
+
+    def apply_change(self, subject: str, key: str, version: int) -> None:
+        """Drop the cached value if it is older than ``version``."""
+        entry = self._entries.get((subject, key))
+        if entry is not None and entry[2] < version:
+            del self._entries[(subject, key)]
+            self.invalidated += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _load(self, subject: str, keys: List[str], fetch: Callable[[List[str]], Awaitable[Fetched]]) -> Fetched:
+        try:
+            fetched = await fetch(keys)
+            for key in keys:
+                value, version = fetched.get(key, (None, 0))
+                self._store(subject, key, value, version)
+            return fetched
+        finally:
+            task = asyncio.current_task()
+            for key in keys:
+                if self._inflight.get((subject, key)) is task:
+                    del self._inflight[(subject, key)]
+
+    async def get_many(
+        self, subject: str, keys: List[str], fetch: Callable[[List[str]], Awaitable[Fetched]]
+    ) -> Dict[str, Optional[str]]:
+        if not self.enabled:
+            fetched = await fetch(keys)
+            return {key: fetched.get(key, (None, 0))[0] for key in keys}
+
+        now = time.monotonic()
+        values: Dict[str, Optional[str]] = {}
+        pending: Dict["asyncio.Task[Fetched]", List[str]] = {}
+        missing: List[str] = []
+        for key in keys:
+            cache_key = (subject, key)
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(cache_key)
+                values[key] = entry[1]
+                self.hits += 1
+                continue
+            task = self._inflight.get(cache_key)
+            if task is not None:
+                pending.setdefault(task, []).append(key)
+                self.coalesced += 1
+            else:
+                missing.append(key)
+                self.misses += 1
+
+        if missing:
+            # Run the fetch as its own task so a cancelled caller does not fail the waiters sharing it.
+            task = asyncio.ensure_future(self._load(subject, missing, fetch))
+            for key in missing:
+                self._inflight[(subject, key)] = task
+            pending[task] = missing
+
+        for task, task_keys in pending.items():
+            fetched = await asyncio.shield(task)
+            for key in task_keys:
+                values[key] = fetched.get(key, (None, 0))[0]
+        return {key: values[key] for key in keys}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evicted": self.evicted,
+            "invalidated": self.invalidated,
+        }
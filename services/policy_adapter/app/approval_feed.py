@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class ApprovalFeed:
+    """Bounded ring buffer of approval decisions, plus waiters parked per approval.
+
+    ``publish`` is called from the threadpool that runs ``/policy/approve``,
+    so waking waiters is handed to the bound event loop with
+    ``call_soon_threadsafe``. A decision wakes only the waiters of its own
+    approval plus stream consumers, never every parked request.
+    """
+
+    def __init__(self, capacity: int = 10000) -> None:
+        self.capacity = max(1, capacity)
+        self._ring: List[Optional[Dict[str, object]]] = [None] * self.capacity
+        self._next_seq = 1
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed = asyncio.Event()
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._parked: Dict[str, int] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def publish(self, approval_id: str, status: str) -> int:
+        with self._lock:
+            seq = self._next_seq
+            self._ring[seq % self.capacity] = {
+                "seq": seq,
+                "approval_id": approval_id,
+                "status": status,
+                "ts": int(time.time()),
+            }
+            self._next_seq += 1
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._notify, approval_id)
+        return seq
+
+    def _notify(self, approval_id: str) -> None:
+        waiter = self._waiters.pop(approval_id, None)
+        if waiter is not None:
+            waiter.set()
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def read(self, since_seq: int, limit: int = 100) -> Tuple[List[Dict[str, object]], int, bool]:
+        """Return (decisions after ``since_seq``, next cursor, truncated)."""
+        with self._lock:
+            last_seq = self._next_seq - 1
+            oldest_seq = max(1, self._next_seq - self.capacity)
+            truncated = since_seq + 1 < oldest_seq
+            seq = max(since_seq + 1, oldest_seq)
+            entries: List[Dict[str, object]] = []
+            while seq <= last_seq and len(entries) < limit:
+                entries.append(self._ring[seq % self.capacity])
+                seq += 1
+        return entries, max(since_seq, seq - 1), truncated
+
+    async def wait(self, since_seq: int, timeout: float) -> bool:
+        """Wait until any decision newer than ``since_seq`` is published."""
+        if self.last_seq > since_seq:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def wait_for(self, approval_id: str, timeout: float) -> bool:
+        """Park until ``approval_id`` is decided through this process; False on timeout.
+
+        Must be entered without yielding after the caller read the approval as
+        pending, so a decision landing in between still wakes it.
+        """
+        waiter = self._waiters.setdefault(approval_id, asyncio.Event())
+        self._parked[approval_id] = self._parked.get(approval_id, 0) + 1
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # Last waiter out drops the event so timed-out approvals do not accumulate.
+            remaining = self._parked.pop(approval_id) - 1
+            if remaining:
+                self._parked[approval_id] = remaining
+            elif self._waiters.get(approval_id) is waiter:
+                del self._waiters[approval_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "entries": min(self._next_seq - 1, self.capacity),
+                "last_seq": self._next_seq - 1,
+                "waiting_approvals": len(self._waiters),
+            }
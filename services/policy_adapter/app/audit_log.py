@@ -0,0 +1,470 @@
+import bisect
+import fcntl
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+SEGMENT_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+KEYS_SUFFIX = ".keys"
+
+
+class _Segment:
+    __slots__ = ("first_seq", "path", "index", "size", "index_bytes", "keys_bytes")
+
+    def __init__(self, first_seq: int, path: str) -> None:
+        self.first_seq = first_seq
+        self.path = path
+        # Sparse (seq, ts, byte offset) entries, one every ``index_interval`` records.
+        self.index: List[Tuple[int, int, int]] = []
+        self.size = 0
+        # How much of the sidecars has been loaded, so appends by other processes can be picked up.
+        self.index_bytes = 0
+        self.keys_bytes = 0
+
+    @property
+    def index_path(self) -> str:
+        return self.path[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+
+    @property
+    def keys_path(self) -> str:
+        return self.path[: -len(SEGMENT_SUFFIX)] + KEYS_SUFFIX
+
+
+class AuditLog:
+    """Append-only audit log stored as size-rotated JSONL segment files.
+
+    Every record gets a monotonically increasing ``seq``. Each segment has a
+    sidecar ``.idx`` file of sparse (seq, ts, offset) entries so readers can
+    seek close to a sequence number or timestamp and scan only a few records.
+    Timestamp seeks assume ``ts`` is non-decreasing in append order.
+
+    Values of ``indexed_fields`` are kept as posting lists of index blocks
+    (the records between two sparse index entries), persisted in a ``.keys``
+    sidecar per segment, so equality filters only read blocks that contain a
+    match. Only the tail segment's postings stay resident; sealed segments'
+    are loaded on demand into an LRU of ``postings_cache_segments`` entries.
+
+    Several processes may share one directory: appends hold an exclusive
+    ``flock`` on it and first catch up on records, index entries and
+    rotations written by the others, so ``seq`` stays gap-free across them.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        index_interval: int = 128,
+        fsync: bool = False,
+        indexed_fields: Sequence[str] = ("jti", "agent_did", "decision"),
+        postings_cache_segments: int = 8,
+    ) -> None:
+        self.directory = directory
+        self.indexed_fields = tuple(indexed_fields)
+        # (field, value) -> ascending first-seqs of the tail segment's index blocks holding that value.
+        self._tail_postings: Dict[Tuple[str, str], List[int]] = {}
+        # Sealed segment first_seq -> its postings, least recently used first.
+        self._sealed_postings: "OrderedDict[int, Dict[Tuple[str, str], List[int]]]" = OrderedDict()
+        self.postings_cache_segments = max(1, postings_cache_segments)
+        self.segment_bytes = segment_bytes
+        self.index_interval = max(1, index_interval)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._segments: List[_Segment] = []
+        self._next_seq = 1
+        self._since_index = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fh = open(os.path.join(directory, ".lock"), "a")
+        with self._flock(fcntl.LOCK_EX):
+            self._load()
+        self._open_tail()
+
+    @contextmanager
+    def _flock(self, mode: int) -> Iterator[None]:
+        fcntl.flock(self._lock_fh.fileno(), mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_UN)
+
+    def _open_tail(self) -> None:
+        segment = self._segments[-1]
+        self._fh = open(segment.path, "ab")
+        self._index_fh = open(segment.index_path, "a", encoding="utf-8")
+        self._keys_fh = open(segment.keys_path, "a", encoding="utf-8")
+        self._tail_path = segment.path
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{first_seq:020d}{SEGMENT_SUFFIX}")
+
+    def _load(self) -> None:
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            segment = _Segment(int(name[: -len(SEGMENT_SUFFIX)]), os.path.join(self.directory, name))
+            segment.size = os.path.getsize(segment.path)
+            if os.path.exists(segment.index_path):
+                self._read_index(segment)
+            self._segments.append(segment)
+
+        if not self._segments:
+            segment = _Segment(1, self._segment_path(1))
+            open(segment.path, "ab").close()
+            self._segments.append(segment)
+            return
+
+        for segment in self._segments[:-1]:
+            if not segment.index:
+                self._rebuild_index(segment)
+        self._recover_tail(self._segments[-1])
+        for segment in self._segments[:-1]:
+            if not os.path.exists(segment.keys_path):
+                self._rebuild_keys(segment)
+        tail = self._segments[-1]
+        if os.path.exists(tail.keys_path):
+            tail.keys_bytes = self._read_keys(tail, self._tail_postings, 0)
+        else:
+            self._tail_postings = self._rebuild_keys(tail)
+
+    def _read_index(self, segment: _Segment) -> None:
+        with open(segment.index_path, "rb") as fh:
+            fh.seek(segment.index_bytes)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break
+                segment.index_bytes += len(line)
+                parts = line.split()
+                if len(parts) == 3:
+                    seq, ts, offset = (int(part) for part in parts)
+                    if offset < segment.size:
+                        segment.index.append((seq, ts, offset))
+
+    @staticmethod
+    def _read_keys(segment: _Segment, postings: Dict[Tuple[str, str], List[int]], offset: int) -> int:
+        # Loads complete .keys lines from ``offset`` into ``postings``; returns the offset read up to.
+        with open(segment.keys_path, "rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                parts = line.decode("utf-8").rstrip("\n").split("\t", 2)
+                if len(parts) == 3:
+                    AuditLog._add_posting(postings, parts[1], parts[2], int(parts[0]))
+        return offset
+
+    def _write_index(self, segment: _Segment) -> None:
+        with open(segment.index_path, "w", encoding="utf-8") as fh:
+            for entry in segment.index:
+                fh.write("%d %d %d\n" % entry)
+        segment.index_bytes = os.path.getsize(segment.index_path)
+
+    def _rebuild_index(self, segment: _Segment) -> None:
+        segment.index = []
+        count = 0
+        for seq, record, offset, _ in self._scan(segment, 0):
+            if count % self.index_interval == 0:
+                segment.index.append((seq, int(record.get("ts") or 0), offset))
+            count += 1
+        self._write_index(segment)
+
+    @staticmethod
+    def _add_posting(postings: Dict[Tuple[str, str], List[int]], field: str, value: str, block_seq: int) -> bool:
+        blocks = postings.setdefault((field, value), [])
+        if blocks and blocks[-1] >= block_seq:
+            return False
+        blocks.append(block_seq)
+        return True
+
+    def _rebuild_keys(self, segment: _Segment) -> Dict[Tuple[str, str], List[int]]:
+        postings: Dict[Tuple[str, str], List[int]] = {}
+        with open(segment.keys_path, "w", encoding="utf-8") as fh:
+            for seq, record, _, _ in self._scan(segment, 0):
+                entry = bisect.bisect_right([entry_seq for entry_seq, _, _ in segment.index], seq) - 1
+                block_seq = segment.index[entry][0] if entry >= 0 else segment.first_seq
+                for field in self.indexed_fields:
+                    value = record.get(field)
+                    if value is not None and self._add_posting(postings, field, str(value), block_seq):
+                        fh.write("%d\t%s\t%s\n" % (block_seq, field, value))
+        segment.keys_bytes = os.path.getsize(segment.keys_path)
+        return postings
+
+    def _cache_postings(self, first_seq: int, postings: Dict[Tuple[str, str], List[int]]) -> None:
+        # Caller holds self._lock.
+        self._sealed_postings[first_seq] = postings
+        self._sealed_postings.move_to_end(first_seq)
+        while len(self._sealed_postings) > self.postings_cache_segments:
+            self._sealed_postings.popitem(last=False)
+
+    def _seal_tail(self, segment: _Segment) -> None:
+        # ``segment`` stops being the tail; its complete postings become the most recently used sealed entry.
+        self._cache_postings(segment.first_seq, self._tail_postings)
+        self._tail_postings = {}
+
+    def _scan_tail(self, segment: _Segment) -> Tuple[int, int, int]:
+        # Returns (last complete seq, end offset, records since the last index entry).
+        end = segment.index[-1][2] if segment.index else 0
+        last_seq = segment.first_seq - 1
+        since_index = 0
+        for seq, _, offset, length in self._scan(segment, end):
+            last_seq = seq
+            end = offset + length
+            since_index += 1
+        return last_seq, end, since_index
+
+    def _recover_tail(self, segment: _Segment) -> None:
+        # Find the last complete record and drop any torn write after it.
+        if not segment.index:
+            self._rebuild_index(segment)
+        while True:
+            last_seq, end, since_index = self._scan_tail(segment)
+            if segment.index and since_index == 0:
+                # The last index entry points at a record that never fully landed.
+                segment.index.pop()
+                self._write_index(segment)
+                continue
+            break
+        if segment.size > end:
+            with open(segment.path, "r+b") as fh:
+                fh.truncate(end)
+            segment.size = end
+        self._next_seq = last_seq + 1 if last_seq >= segment.first_seq else segment.first_seq
+        self._since_index = since_index
+
+    def _sync(self) -> None:
+        # Caller holds self._lock and the directory flock; no other process is mid-append.
+        while True:
+            segment = self._segments[-1]
+            size = os.path.getsize(segment.path)
+            if size != segment.size:
+                segment.size = size
+                self._read_index(segment)
+                segment.keys_bytes = self._read_keys(segment, self._tail_postings, segment.keys_bytes)
+                last_seq, _, self._since_index = self._scan_tail(segment)
+                self._next_seq = max(self._next_seq, last_seq + 1)
+            rotated = self._segment_path(self._next_seq)
+            if rotated == segment.path or not os.path.exists(rotated):
+                break
+            self._seal_tail(segment)
+            self._segments.append(_Segment(self._next_seq, rotated))
+            self._since_index = 0
+        if self._segments[-1].path != self._tail_path:
+            self._fh.close()
+            self._index_fh.close()
+            self._keys_fh.close()
+            self._open_tail()
+
+    @staticmethod
+    def _scan(segment: _Segment, offset: int) -> Iterator[Tuple[int, Dict[str, object], int, int]]:
+        with open(segment.path, "rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    return
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    return
+                yield int(record["seq"]), record, offset, len(line)
+                offset += len(line)
+
+    def _rotate(self, first_seq: int) -> _Segment:
+        self._fh.close()
+        self._index_fh.close()
+        self._keys_fh.close()
+        self._seal_tail(self._segments[-1])
+        segment = _Segment(first_seq, self._segment_path(first_seq))
+        self._segments.append(segment)
+        self._open_tail()
+        self._since_index = 0
+        return segment
+
+    def append(self, event: Dict[str, object]) -> int:
+        return self.append_many([event])[0]
+
+    def append_many(self, events: Sequence[Dict[str, object]]) -> List[int]:
+        """Append events in order under one lock acquisition and one flush (and fsync)."""
+        with self._lock, self._flock(fcntl.LOCK_EX):
+            self._sync()
+            seqs = [self._write(event) for event in events]
+            self._index_fh.flush()
+            self._keys_fh.flush()
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+            return seqs
+
+    def _write(self, event: Dict[str, object]) -> int:
+        # Caller holds both locks and flushes; _rotate closes (and so flushes) the previous tail.
+        seq = self._next_seq
+        record = dict(event, seq=seq)
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        segment = self._segments[-1]
+        if segment.size and segment.size + len(line) > self.segment_bytes:
+            segment = self._rotate(seq)
+        if not segment.index or self._since_index >= self.index_interval:
+            entry = (seq, int(record.get("ts") or 0), segment.size)
+            segment.index.append(entry)
+            line_index = "%d %d %d\n" % entry
+            self._index_fh.write(line_index)
+            segment.index_bytes += len(line_index.encode("utf-8"))
+            self._since_index = 0
+        block_seq = segment.index[-1][0]
+        for field in self.indexed_fields:
+            value = record.get(field)
+            if value is not None and self._add_posting(self._tail_postings, field, str(value), block_seq):
+                line_keys = "%d\t%s\t%s\n" % (block_seq, field, value)
+                self._keys_fh.write(line_keys)
+                segment.keys_bytes += len(line_keys.encode("utf-8"))
+        self._fh.write(line)
+        segment.size += len(line)
+        self._next_seq += 1
+        self._since_index += 1
+        return seq
+
+    def _locate(
+        self, segments: List[_Segment], since_seq: int, start_ts: Optional[int]
+    ) -> Tuple[int, int]:
+        # Returns (segment position, byte offset) to start scanning from.
+        first_seqs = [segment.first_seq for segment in segments]
+        position = max(0, bisect.bisect_right(first_seqs, since_seq + 1) - 1)
+        index = segments[position].index
+        entry = bisect.bisect_right([seq for seq, _, _ in index], since_seq + 1) - 1
+        by_seq = (position, index[entry][2] if entry >= 0 else 0)
+        if start_ts is None:
+            return by_seq
+
+        # Only the freshly rotated tail segment can be empty; sort it last.
+        first_ts = [segment.index[0][1] if segment.index else 1 << 62 for segment in segments]
+        position = max(0, bisect.bisect_left(first_ts, start_ts) - 1)
+        index = segments[position].index
+        entry = bisect.bisect_left([ts for _, ts, _ in index], start_ts) - 1
+        by_ts = (position, index[entry][2] if entry >= 0 else 0)
+        return max(by_seq, by_ts)
+
+    def _block_location(self, segments: List[_Segment], block_seq: int) -> Optional[Tuple[int, int, int]]:
+        # Returns (segment position, byte offset, first seq of the following block).
+        position = bisect.bisect_right([segment.first_seq for segment in segments], block_seq) - 1
+        if position < 0:
+            return None
+        index = segments[position].index
+        entry = bisect.bisect_left([seq for seq, _, _ in index], block_seq)
+        if entry >= len(index) or index[entry][0] != block_seq:
+            return None
+        if entry + 1 < len(index):
+            next_seq = index[entry + 1][0]
+        elif position + 1 < len(segments):
+            next_seq = segments[position + 1].first_seq
+        else:
+            next_seq = 1 << 62
+        return position, index[entry][2], next_seq
+
+    def read(
+        self,
+        since_seq: int = 0,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        until_seq: Optional[int] = None,
+        filters: Optional[Dict[str, str]] = None,
+    ) -> Iterator[Dict[str, object]]:
+        """Yield records with ``since_seq < seq <= until_seq`` in append order.
+
+        ``start_ts``/``end_ts`` bound ``ts`` inclusively and ``filters`` are
+        exact matches on record fields. ``until_seq`` defaults to the log's end
+        at call time, so a stream that is consumed slowly still terminates.
+        """
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        indexed = {field: str(value) for field, value in filters.items() if field in self.indexed_fields}
+        with self._lock, self._flock(fcntl.LOCK_SH):
+            self._sync()
+            segments = list(self._segments)
+            end_seq = self._next_seq if until_seq is None else min(self._next_seq, until_seq + 1)
+
+        def matches(record: Dict[str, object]) -> bool:
+            return all(str(record.get(field)) == str(value) for field, value in filters.items())
+
+        position, offset = self._locate(segments, since_seq, start_ts)
+        if not indexed:
+            spans = []
+            for segment in segments[position:]:
+                spans.append((segment, offset, 1 << 62))
+                offset = 0
+        else:
+            # _locate lands on a block boundary, so any candidate block that
+            # starts before it lies entirely before the requested range.
+            spans = []
+            for segment in segments[position:]:
+                if segment.first_seq >= end_seq:
+                    break
+                for block_seq in self._candidate_blocks(segment, indexed):
+                    location = self._block_location(segments, block_seq)
+                    if location is None or (location[0], location[1]) < (position, offset):
+                        continue
+                    spans.append((segments[location[0]], location[1], location[2]))
+
+        for segment, offset, stop_seq in spans:
+            for seq, record, _, _ in self._scan(segment, offset):
+                if seq >= end_seq:
+                    return
+                if seq >= stop_seq:
+                    break
+                if seq <= since_seq:
+                    continue
+                ts = int(record.get("ts") or 0)
+                if start_ts is not None and ts < start_ts:
+                    continue
+                if end_ts is not None and ts > end_ts:
+                    return
+                if filters and not matches(record):
+                    continue
+                yield record
+
+    def _candidate_blocks(self, segment: _Segment, indexed: Dict[str, str]) -> List[int]:
+        """First seqs of the blocks in ``segment`` that hold every ``indexed`` value, ascending."""
+        with self._lock:
+            postings = self._tail_postings if segment is self._segments[-1] else None
+            if postings is None and segment.first_seq in self._sealed_postings:
+                postings = self._sealed_postings[segment.first_seq]
+                self._sealed_postings.move_to_end(segment.first_seq)
+            if postings is not None:
+                return self._intersect(postings, indexed)
+        # Sealed segments never change, so their sidecar is read without holding the log locks.
+        postings = {}
+        self._read_keys(segment, postings, 0)
+        with self._lock:
+            self._cache_postings(segment.first_seq, postings)
+        return self._intersect(postings, indexed)
+
+    @staticmethod
+    def _intersect(postings: Dict[Tuple[str, str], List[int]], indexed: Dict[str, str]) -> List[int]:
+        candidates: Optional[Set[int]] = None
+        for field, value in indexed.items():
+            blocks = set(postings.get((field, value), ()))
+            candidates = blocks if candidates is None else candidates & blocks
+        return sorted(candidates or ())
+
+    @property
+    def next_seq(self) -> int:
+        with self._lock, self._flock(fcntl.LOCK_SH):
+            self._sync()
+            return self._next_seq
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock, self._flock(fcntl.LOCK_SH):
+            self._sync()
+            return {
+                "segments": len(self._segments),
+                "next_seq": self._next_seq,
+                "bytes": sum(segment.size for segment in self._segments),
+                "postings": len(self._tail_postings) + sum(map(len, self._sealed_postings.values())),
+                "cached_posting_segments": len(self._sealed_postings),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+            self._index_fh.close()
+            self._keys_fh.close()
+            self._lock_fh.close()
@@ -0,0 +1,45 @@
+# Vendored into services/policy_adapter/app and services/vault_api/app, which deploy separately;
+# keep both copies identical (scripts/check_vendored.sh).
+import heapq
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class ExpiryQueue:
+    """Min-heap of (deadline, key) used to evict state incrementally.
+
+    A key keeps its earliest known deadline; rescheduling to an earlier time
+    leaves a stale heap entry behind that is skipped when it surfaces.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, Hashable]] = []
+        self._deadlines: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        with self._lock:
+            current = self._deadlines.get(key)
+            if current is not None and current <= deadline:
+                return
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, key))
+
+    def pop_due(self, now: Optional[float] = None, limit: int = 500) -> List[Hashable]:
+        now = time.time() if now is None else now
+        due: List[Hashable] = []
+        with self._lock:
+            while self._heap and len(due) < limit and self._heap[0][0] <= now:
+                deadline, key = heapq.heappop(self._heap)
+                if self._deadlines.get(key) != deadline:
+                    continue
+                del self._deadlines[key]
+                due.append(key)
+            self.evicted += len(due)
+        return due
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"scheduled": len(self._deadlines), "heap": len(self._heap), "evicted": self.evicted}
@@ -0,0 +1,242 @@
+import base64
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# Scopes look like ``prefs:outreach_tone.read`` and resources like ``prefs.outreach_tone``;
+# patterns are matched segment by segment with the separators kept as their own tokens.
+_SEPARATORS = re.compile(r"([:.])")
+_WILDCARD = "*"
+# Memoised DFA transitions per pattern set; beyond this lookups still work, just uncached.
+_MAX_TRANSITIONS = 4096
+
+
+def _b64url_decode(value: str) -> bytes:
+    padding = "=" * (-len(value) % 4)
+    return base64.urlsafe_b64decode(value + padding)
+
+
+def _tokens(value: str) -> List[str]:
+    return _SEPARATORS.split(value)
+
+
+class PatternSet:
+    """Exact strings plus wildcard patterns, compiled once into a segment trie.
+
+    A ``*`` segment matches exactly one segment (``prefs:*.read``); a trailing
+    ``*`` matches one or more remaining segments (``prefs.*``, ``*``). The trie
+    is walked as a lazily built DFA whose states are sets of trie nodes, so
+    after warm-up a lookup is one cached transition per key segment no matter
+    how many patterns the token carries.
+
+    A compiled set is shared by every request using the token, so new DFA
+    states and transitions are built under a lock; a cached transition only
+    ever points at a fully interned state, so the lookup path stays lock-free.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._exact: FrozenSet[str] = frozenset(p for p in patterns if _WILDCARD not in p)
+        # Trie nodes: children by token, plus whether a pattern ends here or matches the rest.
+        self._children: List[Dict[str, int]] = [{}]
+        self._ends: List[bool] = [False]
+        self._rest: List[bool] = [False]
+        for pattern in patterns:
+            if _WILDCARD in pattern:
+                self._insert(_tokens(pattern))
+        # DFA states are interned sets of trie nodes; state 0 is the dead state.
+        self._states: Dict[FrozenSet[int], int] = {}
+        self._state_nodes: List[FrozenSet[int]] = []
+        self._state_ends: List[bool] = []
+        self._state_rest: List[bool] = []
+        self._intern(frozenset())
+        self._start = self._intern(frozenset([0])) if len(self._children) > 1 or self._rest[0] else 0
+        self._transitions: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _insert(self, tokens: List[str]) -> None:
+        node = 0
+        for position, token in enumerate(tokens):
+            if token == _WILDCARD and position == len(tokens) - 1:
+                self._rest[node] = True
+                return
+            child = self._children[node].get(token)
+            if child is None:
+                child = len(self._children)
+                self._children.append({})
+                self._ends.append(False)
+                self._rest.append(False)
+                self._children[node][token] = child
+            node = child
+        self._ends[node] = True
+
+    def _intern(self, nodes: FrozenSet[int]) -> int:
+        state = self._states.get(nodes)
+        if state is None:
+            state = len(self._state_nodes)
+            self._state_nodes.append(nodes)
+            self._state_ends.append(any(self._ends[node] for node in nodes))
+            self._state_rest.append(any(self._rest[node] for node in nodes))
+            self._states[nodes] = state
+        return state
+
+    def _step(self, state: int, token: str) -> int:
+        following = set()
+        for node in self._state_nodes[state]:
+            children = self._children[node]
+            child = children.get(token)
+            if child is not None:
+                following.add(child)
+            # A wildcard stands for a segment, never for a separator.
+            if token not in (":", ".") and _WILDCARD in children:
+                following.add(children[_WILDCARD])
+        with self._lock:
+            result = self._intern(frozenset(following))
+            if len(self._transitions) < _MAX_TRANSITIONS:
+                self._transitions[(state, token)] = result
+        return result
+
+    def __contains__(self, value: str) -> bool:
+        if value in self._exact:
+            return True
+        state = self._start
+        if not state or not value:
+            return False
+        transitions = self._transitions
+        for token in _tokens(value):
+            if token and self._state_rest[state]:
+                return True
+            following = transitions.get((state, token))
+            state = self._step(state, token) if following is None else following
+            if not state:
+                return False
+        return self._state_ends[state]
+
+    def __len__(self) -> int:
+        return len(self._exact) + sum(self._ends) + sum(self._rest)
+
+
+class Grants(ABC):
+    """Scopes and resources a consent token allows, built once per token."""
+
+    @abstractmethod
+    def allows_scope(self, scope: str) -> bool:
+        ...
+
+    @abstractmethod
+    def allows_resource(self, resource: str) -> bool:
+        ...
+
+
+class ListGrants(Grants):
+    """Grants from the ``scp``/``res`` lists of a regular token; entries may be wildcard patterns."""
+
+    def __init__(self, scopes: List[str], resources: List[str]) -> None:
+        self.scopes = PatternSet(scopes)
+        self.resources = PatternSet(resources)
+
+    def allows_scope(self, scope: str) -> bool:
+        return scope in self.scopes
+
+    def allows_resource(self, resource: str) -> bool:
+        return resource in self.resources
+
+
+class RegistryVersion:
+    __slots__ = ("version", "digest", "scope_index", "resource_index", "scope_patterns", "resource_patterns")
+
+    def __init__(self, snapshot: Dict[str, object]) -> None:
+        self.version = int(snapshot["version"])
+        self.digest = str(snapshot["digest"])
+        self.scope_index = {value: index for index, value in enumerate(snapshot["scopes"])}
+        self.resource_index = {value: index for index, value in enumerate(snapshot["resources"])}
+        self.scope_patterns = [(index, value) for value, index in self.scope_index.items() if _WILDCARD in value]
+        self.resource_patterns = [(index, value) for value, index in self.resource_index.items() if _WILDCARD in value]
+
+
+def _granted_patterns(patterns: List[Tuple[int, str]], bits: int) -> Optional[PatternSet]:
+    granted = [value for index, value in patterns if (bits >> index) & 1]
+    return PatternSet(granted) if granted else None
+
+
+class BitmapGrants(Grants):
+    """Grants from a compact token: exact membership is one dict lookup and a bit test.
+
+    Wildcard patterns whose bits are set are compiled into a ``PatternSet``
+    and consulted only when the exact test misses.
+    """
+
+    def __init__(self, registry: RegistryVersion, scope_bits: int, resource_bits: int) -> None:
+        self.registry = registry
+        self.scope_bits = scope_bits
+        self.resource_bits = resource_bits
+        self.scope_patterns = _granted_patterns(registry.scope_patterns, scope_bits)
+        self.resource_patterns = _granted_patterns(registry.resource_patterns, resource_bits)
+
+    def allows_scope(self, scope: str) -> bool:
+        index = self.registry.scope_index.get(scope)
+        if index is not None and (self.scope_bits >> index) & 1 == 1:
+            return True
+        return self.scope_patterns is not None and scope in self.scope_patterns
+
+    def allows_resource(self, resource: str) -> bool:
+        index = self.registry.resource_index.get(resource)
+        if index is not None and (self.resource_bits >> index) & 1 == 1:
+            return True
+        return self.resource_patterns is not None and resource in self.resource_patterns
+
+
+class RegistryCache:
+    """Published scope-registry versions, fetched once per (version, digest).
+
+    A version never changes while the vault runs, but a vault running without
+    a persisted registry rebuilds it on restart, so the same version number
+    can come back with different contents. A token whose digest differs from the
+    cached copy therefore triggers a refetch instead of a permanent mismatch.
+    Each version holds full indexes, so at most ``max_versions`` are kept,
+    least recently used evicted first.
+    """
+
+    def __init__(self, fetch: Callable[[int], Dict[str, object]], max_versions: int = 64) -> None:
+        self._fetch = fetch
+        self.max_versions = max(1, max_versions)
+        self._versions: "OrderedDict[int, RegistryVersion]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.evicted = 0
+
+    def get(self, version: int, digest: Optional[str] = None) -> RegistryVersion:
+        with self._lock:
+            cached = self._versions.get(version)
+            if cached is not None and (digest is None or cached.digest == digest):
+                self._versions.move_to_end(version)
+                return cached
+            # Fetched under the lock so concurrent misses on one version cost one request.
+            self.fetches += 1
+            cached = self._versions[version] = RegistryVersion(self._fetch(version))
+            self._versions.move_to_end(version)
+            while len(self._versions) > self.max_versions:
+                self._versions.popitem(last=False)
+                self.evicted += 1
+            return cached
+
+    def stats(self) -> Dict[str, int]:
+        return {"versions": len(self._versions), "fetches": self.fetches, "evicted": self.evicted}
+
+
+def grants_for(payload: Dict[str, object], registry: Optional[RegistryCache]) -> Grants:
+    """Build grants for a verified payload; raises ValueError for a compact token it cannot expand."""
+    if "reg" not in payload:
+        return ListGrants(list(payload.get("scp") or []), list(payload.get("res") or []))
+    if registry is None:
+        raise ValueError("compact_tokens_unsupported")
+    version = registry.get(int(payload["reg"]), str(payload.get("rgh")))
+    if version.digest != payload.get("rgh"):
+        raise ValueError("registry_mismatch")
+    return BitmapGrants(
+        version,
+        int.from_bytes(_b64url_decode(str(payload.get("scpb") or "")), "little"),
+        int.from_bytes(_b64url_decode(str(payload.get("resb") or "")), "little"),
+    )
+
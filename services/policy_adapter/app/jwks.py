@@ -0,0 +1,101 @@
+import base64
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+
+def _b64url_decode(value: str) -> bytes:
+    padding = "=" * (-len(value) % 4)
+    return base64.urlsafe_b64decode(value + padding)
+
+
+def _parse_jwks(body: Dict[str, object]) -> Dict[str, ed25519.Ed25519PublicKey]:
+    keys: Dict[str, ed25519.Ed25519PublicKey] = {}
+    for jwk in body.get("keys") or []:
+        if jwk.get("kty") != "OKP" or jwk.get("crv") != "Ed25519" or not jwk.get("kid"):
+            continue
+        keys[str(jwk["kid"])] = ed25519.Ed25519PublicKey.from_public_bytes(_b64url_decode(str(jwk["x"])))
+    return keys
+
+
+class JwksCache:
+    """Verification keys by ``kid``, refreshed off the request path.
+
+    Lookups only ever read the in-memory map. Once the copy is older than
+    ``ttl_s`` (or a lookup asks for an unknown kid) a single background thread
+    refetches it while callers keep using the stale keys, so a slow or
+    unreachable JWKS endpoint never adds latency to verification. Unknown-kid
+    refreshes are spaced at least ``min_refresh_s`` apart so tokens with made-up
+    kids cannot turn into a fetch storm.
+    """
+
+    def __init__(
+        self,
+        fetch: Optional[Callable[[], Dict[str, object]]],
+        ttl_s: float = 300,
+        min_refresh_s: float = 5,
+        static_keys: Optional[Dict[str, ed25519.Ed25519PublicKey]] = None,
+    ) -> None:
+        self._fetch = fetch
+        self.ttl_s = ttl_s
+        self.min_refresh_s = min_refresh_s
+        # Configured keys survive refreshes; fetched keys replace each other wholesale.
+        self._static = dict(static_keys or {})
+        self._keys: Dict[str, ed25519.Ed25519PublicKey] = dict(self._static)
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.failures = 0
+        self.unknown_kids = 0
+
+    def get(self, kid: str) -> Optional[ed25519.Ed25519PublicKey]:
+        key = self._keys.get(kid)
+        now = time.time()
+        if key is None:
+            self.unknown_kids += 1
+            if now - self._attempted_at >= self.min_refresh_s:
+                self._refresh_in_background()
+        elif now - self._fetched_at >= self.ttl_s:
+            self._refresh_in_background()
+        return key
+
+    def _refresh_in_background(self) -> None:
+        if self._fetch is None:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="jwks-refresh", daemon=True).start()
+
+    def refresh(self) -> bool:
+        """Fetch the JWKS now; on failure the current keys are kept and False is returned."""
+        if self._fetch is None:
+            return False
+        self._attempted_at = time.time()
+        try:
+            keys = _parse_jwks(self._fetch())
+            keys.update(self._static)
+            self._keys = keys
+            self._fetched_at = time.time()
+            self.refreshes += 1
+            return True
+        except Exception:
+            self.failures += 1
+            return False
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "kids": sorted(self._keys),
+            "age_s": round(time.time() - self._fetched_at, 1) if self._fetched_at else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "unknown_kids": self.unknown_kids,
+        }
@@ -1,20 +1,71 @@
+import asyncio
 import base64
 import json
 import os
+import threading
 import time
 import uuid
-from typing import Dict, List, Literal, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
 
+import httpx
 import jwt
 from cryptography.hazmat.primitives.asymmetric import ed25519
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import PlainTextResponse
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
+from .approval_feed import ApprovalFeed
+from .audit_log import AuditLog
+from .grants import Grants, RegistryCache, grants_for
+from .jwks import JwksCache
+from .revocation import RevocationStore
+from .rollups import DIMENSIONS, GRANULARITIES, AuditRollups
+from .state import create_policy_state
+from .token_cache import TokenCache
+
 AUDIENCE = os.getenv("JWT_AUDIENCE", "memmachine-policy-adapter")
+# Publishes the scope registry that compact tokens are encoded against.
+VAULT_API_URL = os.getenv("VAULT_API_URL", "http://localhost:8001").rstrip("/")
+REGISTRY_CACHE_VERSIONS = int(os.getenv("REGISTRY_CACHE_VERSIONS", "64"))
 RECEIVER_ADDRESS = os.getenv("X402_RECEIVER_ADDRESS", "")
 X402_ASSET = os.getenv("X402_ASSET", "USDC")
 HOLD_THRESHOLD = float(os.getenv("HOLD_THRESHOLD", "0.05"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+# Upper bound on consent TTL (vault_api caps ttl_seconds at 3600); used when a jti's exp is unknown.
+MAX_TOKEN_TTL_S = int(os.getenv("MAX_TOKEN_TTL_S", "3600"))
+APPROVAL_TTL_S = int(os.getenv("APPROVAL_TTL_S", "3600"))
+APPROVAL_FEED_CAPACITY = int(os.getenv("APPROVAL_FEED_CAPACITY", "10000"))
+APPROVAL_WAIT_MAX_S = float(os.getenv("APPROVAL_WAIT_MAX_S", "30"))
+# Waiters re-read shared state this often to see decisions made through other workers.
+APPROVAL_WAIT_POLL_S = float(os.getenv("APPROVAL_WAIT_POLL_S", "1.0"))
+APPROVAL_STREAM_KEEPALIVE_S = float(os.getenv("APPROVAL_STREAM_KEEPALIVE_S", "15"))
+APPROVAL_BULK_MAX = int(os.getenv("APPROVAL_BULK_MAX", "1000"))
+SWEEP_INTERVAL_S = float(os.getenv("SWEEP_INTERVAL_S", "1.0"))
+SWEEP_BATCH = int(os.getenv("SWEEP_BATCH", "500"))
+AUDIT_LOG_DIR = os.getenv("AUDIT_LOG_DIR", ".audit_log")
+AUDIT_SEGMENT_BYTES = int(os.getenv("AUDIT_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+AUDIT_INDEX_INTERVAL = int(os.getenv("AUDIT_INDEX_INTERVAL", "128"))
+AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "false").lower() == "true"
+# Sealed segments whose posting lists stay in memory; older ones are reread from their .keys sidecar.
+AUDIT_POSTINGS_CACHE_SEGMENTS = int(os.getenv("AUDIT_POSTINGS_CACHE_SEGMENTS", "8"))
+ROLLUP_MINUTE_BUCKETS = int(os.getenv("ROLLUP_MINUTE_BUCKETS", "1440"))
+ROLLUP_HOUR_BUCKETS = int(os.getenv("ROLLUP_HOUR_BUCKETS", "168"))
+# memory:// keeps state per process; sqlite:///path shares it between uvicorn workers on one host.
+POLICY_STATE_URL = os.getenv("POLICY_STATE_URL", "memory://")
+REVOCATION_FILTER_CAPACITY = int(os.getenv("REVOCATION_FILTER_CAPACITY", "100000"))
+REVOCATION_FILTER_ERROR_RATE = float(os.getenv("REVOCATION_FILTER_ERROR_RATE", "0.001"))
+REVOCATION_PEERS = [peer.strip().rstrip("/") for peer in os.getenv("REVOCATION_PEERS", "").split(",") if peer.strip()]
+REVOCATION_SYNC_INTERVAL_S = float(os.getenv("REVOCATION_SYNC_INTERVAL_S", "5"))
+# How often revocations other workers wrote to the shared policy state are merged into this worker's filter.
+REVOCATION_MERGE_INTERVAL_S = float(os.getenv("REVOCATION_MERGE_INTERVAL_S", "0.25"))
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+# Verification keys by kid; an empty JWKS_URL relies on JWT_ED25519_PUBLIC_KEY_B64 alone.
+JWKS_URL = os.getenv("JWKS_URL", f"{VAULT_API_URL}/.well-known/jwks.json")
+JWKS_KID = os.getenv("JWKS_KID", "wv_jwks_1")
+JWKS_TTL_S = float(os.getenv("JWKS_TTL_S", "300"))
+JWKS_MIN_REFRESH_S = float(os.getenv("JWKS_MIN_REFRESH_S", "5"))
 
 
 def _b64url_decode(value: str) -> bytes:
@@ -47,6 +98,32 @@ class PolicyDecisionResponse(BaseModel):
     reason: Optional[str] = None
     approval_id: Optional[str] = None
     receipt: Optional[Dict[str, object]] = None
+    retry_after_s: Optional[float] = None
+
+
+class PolicyCheckItem(BaseModel):
+    action: Literal["read", "write"]
+    scope: str
+    resource: str
+    cost_usdc: float = 0.0
+    bytes: int = 0
+
+
+class PolicyCheckBatchRequest(BaseModel):
+    consent_token: str
+    tool: str
+    items: List[PolicyCheckItem] = Field(..., min_length=1)
+    # Charged once per call when at least one item is allowed, on top of item costs.
+    cost_usdc: float = 0.0
+    require_approval: bool = False
+    payment_proof: Optional[str] = None
+    approval_id: Optional[str] = None
+
+
+class PolicyBatchDecisionResponse(BaseModel):
+    decisions: List[PolicyDecisionResponse]
+    approval_id: Optional[str] = None
+    receipt: Optional[Dict[str, object]] = None
 
 
 class ApprovalDecisionRequest(BaseModel):
@@ -54,6 +131,16 @@ class ApprovalDecisionRequest(BaseModel):
     decision: Literal["APPROVE", "DENY"]
 
 
+class ApprovalBulkDecisionRequest(BaseModel):
+    approval_ids: List[str] = Field(..., min_length=1, max_length=APPROVAL_BULK_MAX)
+    decision: Literal["APPROVE", "DENY"]
+
+
+class ApprovalListResponse(BaseModel):
+    approvals: List[Dict[str, object]]
+    next_cursor: Optional[int] = None
+
+
 class RevocationEvent(BaseModel):
     event_type: Literal["CONSENT_REVOKED", "SCOPE_REVOKED"]
     subject_did: str
@@ -63,6 +150,12 @@ class RevocationEvent(BaseModel):
     resources: List[str]
     reason: Optional[str] = None
     idempotency_key: Optional[str] = None
+    exp: Optional[int] = None
+
+
+class RevocationSyncRequest(BaseModel):
+    # [jti, exp] pairs, the same shape /revocations/snapshot and /revocations/delta return.
+    entries: List[Tuple[str, int]]
 
 
 class AuditEvent(BaseModel):
@@ -79,36 +172,225 @@ class AuditEvent(BaseModel):
     details: Dict[str, object]
 
 
-app = FastAPI(title="World Vault Policy Adapter", version="0.1.0")
-public_key = _load_public_key()
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    app.state.approval_feed.bind(asyncio.get_running_loop())
+    # Warm the key cache before serving; if the vault is down, lookups trigger retries later.
+    await asyncio.to_thread(app.state.jwks.refresh)
+    _merge_shared_revocations()
+    tasks = [asyncio.create_task(_sweep_loop()), asyncio.create_task(_revocation_merge_loop())]
+    if REVOCATION_PEERS:
+        tasks.append(asyncio.create_task(_revocation_sync_loop()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        app.state.audit_log.close()
+        app.state.policy_state.close()
 
-# Demo in-memory stores
-app.state.revoked = set()
-app.state.approvals = {}
-app.state.usage = {}
-app.state.audit_events = []
 
+app = FastAPI(title="World Vault Policy Adapter", version="0.1.0", lifespan=lifespan)
+public_key = _load_public_key()
 
-def _decode_token(token: str) -> Dict[str, object]:
-    if public_key is None:
+# Demo in-memory stores
+app.state.revoked = RevocationStore(
+    capacity=REVOCATION_FILTER_CAPACITY,
+    error_rate=REVOCATION_FILTER_ERROR_RATE,
+    window_s=MAX_TOKEN_TTL_S,
+)
+app.state.policy_state = create_policy_state(POLICY_STATE_URL, idempotency_max_keys=IDEMPOTENCY_MAX_KEYS)
+app.state.revocation_cursor = 0
+app.state.approval_feed = ApprovalFeed(capacity=APPROVAL_FEED_CAPACITY)
+app.state.audit_log = AuditLog(
+    AUDIT_LOG_DIR,
+    segment_bytes=AUDIT_SEGMENT_BYTES,
+    index_interval=AUDIT_INDEX_INTERVAL,
+    fsync=AUDIT_FSYNC,
+    postings_cache_segments=AUDIT_POSTINGS_CACHE_SEGMENTS,
+)
+app.state.rollups = AuditRollups(retention={"minute": ROLLUP_MINUTE_BUCKETS, "hour": ROLLUP_HOUR_BUCKETS})
+# Last audit seq folded into the rollups; other workers' appends are caught up from the log.
+app.state.rollup_seq = 0
+app.state.rollup_lock = threading.Lock()
+# Warm the rollups from the retained window only; the log seeks straight to it. Events older
+# than the window are covered too, so the cursor is the log's end, not the last event folded.
+_warm_until = app.state.audit_log.next_seq - 1
+for _event in app.state.audit_log.read(
+    start_ts=int(time.time()) - ROLLUP_HOUR_BUCKETS * 3600, until_seq=_warm_until
+):
+    app.state.rollups.add(_event)
+app.state.rollup_seq = _warm_until
+app.state.token_cache = TokenCache(max_entries=TOKEN_CACHE_SIZE)
+
+
+def _fetch_jwks() -> Dict[str, object]:
+    res = httpx.get(JWKS_URL, timeout=5.0)
+    res.raise_for_status()
+    return res.json()
+
+
+app.state.jwks = JwksCache(
+    _fetch_jwks if JWKS_URL else None,
+    ttl_s=JWKS_TTL_S,
+    min_refresh_s=JWKS_MIN_REFRESH_S,
+    static_keys={JWKS_KID: public_key} if public_key is not None else None,
+)
+
+
+def _verify_token(token: str) -> Dict[str, object]:
+    if public_key is None and not JWKS_URL:
         return jwt.decode(
             token,
             options={"verify_signature": False, "verify_exp": True, "verify_aud": False},
         )
-    return jwt.decode(token, public_key, algorithms=["EdDSA"], audience=AUDIENCE)
+    # Never fetches inline: an unknown kid schedules a background refresh and fails this call.
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = app.state.jwks.get(kid) if kid else public_key
+    if key is None:
+        raise jwt.InvalidTokenError("unknown_kid")
+    return jwt.decode(token, key, algorithms=["EdDSA"], audience=AUDIENCE)
 
 
-def _record_audit(event: AuditEvent) -> None:
-    app.state.audit_events.append(event.model_dump())
+def _fetch_registry(version: int) -> Dict[str, object]:
+    res = httpx.get(f"{VAULT_API_URL}/consent/registry/{version}", timeout=5.0)
+    res.raise_for_status()
+    return res.json()
 
 
-def _ensure_limits(payload: Dict[str, object], action: str, bytes_used: int) -> Optional[str]:
-    limits = payload.get("limits") or {}
-    jti = payload.get("jti")
-    if not jti:
-        return "missing_jti"
+app.state.registry_cache = RegistryCache(_fetch_registry, max_versions=REGISTRY_CACHE_VERSIONS)
+
+
+def _decode_token(token: str) -> Tuple[Dict[str, object], Grants]:
+    # Verified payloads and their grants are reused until exp; revocation is still checked per request.
+    cached = app.state.token_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = _verify_token(token)
+    try:
+        grants = grants_for(payload, app.state.registry_cache)
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=503, detail="scope_registry_unavailable") from exc
+    app.state.token_cache.put(token, payload, grants)
+    return payload, grants
+
+
+def _token_exp(payload: Dict[str, object]) -> float:
+    exp = payload.get("exp")
+    return float(exp) if isinstance(exp, (int, float)) else time.time() + MAX_TOKEN_TTL_S
+
+
+def _is_revoked(jti: str) -> bool:
+    return jti in app.state.revoked
+
+
+def _merge_shared_revocations() -> int:
+    entries, cursor = app.state.policy_state.revocations_since(app.state.revocation_cursor)
+    if entries:
+        app.state.revoked.merge(entries)
+        app.state.revocation_cursor = max(app.state.revocation_cursor, cursor)
+    return len(entries)
+
+
+def _revoke(jti: str, exp: int) -> bool:
+    app.state.policy_state.add_revocation(jti, exp)
+    return app.state.revoked.add(jti, exp)
+
+
+def _sweep_expired(now: Optional[float] = None) -> int:
+    removed = app.state.policy_state.expire(now, limit=SWEEP_BATCH)
+    app.state.revoked.prune(now)
+    return removed
+
+
+async def _sweep_loop() -> None:
+    # Evicts at most SWEEP_BATCH entries per slice and yields in between, so a
+    # backlog of expiries never stalls request handling.
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_S)
+        while _sweep_expired() >= SWEEP_BATCH:
+            await asyncio.sleep(0)
+
+
+async def _revocation_merge_loop() -> None:
+    # Revocations other workers published to the shared state reach this worker's
+    # filter within one interval, off the request path.
+    while True:
+        await asyncio.sleep(REVOCATION_MERGE_INTERVAL_S)
+        _merge_shared_revocations()
+
+
+async def _revocation_sync_loop() -> None:
+    # Pulls deltas from each peer; a changed instance_id means the peer restarted and needs a full snapshot.
+    cursors: Dict[str, Tuple[Optional[str], int]] = {}
+    async with httpx.AsyncClient(timeout=REVOCATION_SYNC_INTERVAL_S) as client:
+        while True:
+            for peer in REVOCATION_PEERS:
+                instance_id, seq = cursors.get(peer, (None, 0))
+                try:
+                    if instance_id is None:
+                        res = await client.get(f"{peer}/revocations/snapshot")
+                    else:
+                        res = await client.get(
+                            f"{peer}/revocations/delta", params={"since_seq": seq, "instance_id": instance_id}
+                        )
+                    res.raise_for_status()
+                    body = res.json()
+                except (httpx.HTTPError, ValueError):
+                    continue
+                app.state.revoked.merge(body.get("entries", []))
+                cursors[peer] = (body.get("instance_id"), int(body.get("seq") or 0))
+            await asyncio.sleep(REVOCATION_SYNC_INTERVAL_S)
+
+
+def _new_approval(request: Dict[str, object], payload: Dict[str, object]) -> str:
+    now = time.time()
+    approval_id = f"appr_{uuid.uuid4().hex[:8]}"
+    record = {
+        "status": "PENDING",
+        # Approvals are listed to reviewers; never store the bearer token or payment proof.
+        "request": {key: value for key, value in request.items() if key not in ("consent_token", "payment_proof")},
+        "created_at": int(now),
+        "agent_did": payload.get("act"),
+        "user_did": payload.get("sub"),
+    }
+    app.state.policy_state.create_approval(approval_id, record, now + APPROVAL_TTL_S)
+    return approval_id
+
+
+def _sync_rollups() -> None:
+    with app.state.rollup_lock:
+        for record in app.state.audit_log.read(since_seq=app.state.rollup_seq):
+            app.state.rollups.add(record)
+            app.state.rollup_seq = int(record["seq"])
 
-    usage = app.state.usage.setdefault(jti, {"reads": 0, "writes": 0, "bytes": 0})
+
+def _record_audit(event: AuditEvent) -> None:
+    _record_audits([event])
+
+
+def _record_audits(events: List[AuditEvent]) -> None:
+    if not events:
+        return
+    records = [event.model_dump() for event in events]
+    seqs = app.state.audit_log.append_many(records)
+    with app.state.rollup_lock:
+        if seqs[0] == app.state.rollup_seq + 1:
+            for record in records:
+                app.state.rollups.add(record)
+            app.state.rollup_seq = seqs[-1]
+            return
+    # Another worker appended in between; fold its records in from the log too.
+    _sync_rollups()
+
+
+def _ensure_limits(
+    payload: Dict[str, object],
+    action: str,
+    bytes_used: int,
+    usage: Dict[str, int],
+) -> Optional[str]:
+    limits = payload.get("limits") or {}
     usage["bytes"] += bytes_used
     if usage["bytes"] > int(limits.get("bytes_cap", 65536)):
         return "bytes_cap_exceeded"
@@ -124,6 +406,13 @@ def _ensure_limits(payload: Dict[str, object], action: str, bytes_used: int) ->
     return None
 
 
+def _check_rate(payload: Dict[str, object]) -> Optional[float]:
+    limits = payload.get("limits") or {}
+    rate_per_min = int(limits.get("rate_per_min", 10))
+    retry_after = app.state.policy_state.acquire_rate(str(payload.get("jti")), rate_per_min, _token_exp(payload))
+    return round(retry_after, 3) if retry_after > 0 else None
+
+
 def _payment_required_response(tool: str, amount: float) -> None:
     raise HTTPException(
         status_code=402,
@@ -144,33 +433,51 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/stats")
+def stats() -> Dict[str, object]:
+    return {
+        "token_cache": app.state.token_cache.stats(),
+        "scope_registry": app.state.registry_cache.stats(),
+        "jwks": app.state.jwks.stats(),
+        "state": app.state.policy_state.stats(),
+        "revocations": app.state.revoked.stats(),
+        "audit_log": app.state.audit_log.stats(),
+        "rollup_buckets": app.state.rollups.stats(),
+        "approval_feed": app.state.approval_feed.stats(),
+    }
+
+
 @app.post("/policy/check", response_model=PolicyDecisionResponse)
 def policy_check(request: PolicyCheckRequest) -> PolicyDecisionResponse:
     try:
-        payload = _decode_token(request.consent_token)
+        payload, grants = _decode_token(request.consent_token)
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=401, detail=f"invalid_token: {exc}") from exc
 
     jti = payload.get("jti")
     if not jti:
         raise HTTPException(status_code=401, detail="missing_jti")
-    if jti in app.state.revoked:
+    if _is_revoked(jti):
         return PolicyDecisionResponse(decision="BLOCK", reason="revoked")
+    retry_after = _check_rate(payload)
+    if retry_after is not None:
+        return PolicyDecisionResponse(decision="BLOCK", reason="rate_limited", retry_after_s=retry_after)
 
-    scopes = set(payload.get("scp") or [])
-    resources = set(payload.get("res") or [])
-    if request.scope not in scopes:
+    if not grants.allows_scope(request.scope):
         return PolicyDecisionResponse(decision="BLOCK", reason="scope_denied")
-    if request.resource not in resources:
+    if not grants.allows_resource(request.resource):
         return PolicyDecisionResponse(decision="BLOCK", reason="resource_denied")
 
-    limit_error = _ensure_limits(payload, request.action, request.bytes)
+    with app.state.policy_state.usage(jti, _token_exp(payload)) as usage:
+        limit_error = _ensure_limits(payload, request.action, request.bytes, usage)
     if limit_error:
         return PolicyDecisionResponse(decision="BLOCK", reason=limit_error)
 
     approval_status: Optional[str] = None
     if request.approval_id:
-        approval = app.state.approvals.get(request.approval_id)
+        approval = app.state.policy_state.get_approval(request.approval_id)
         if not approval:
             return PolicyDecisionResponse(decision="BLOCK", reason="approval_not_found")
         approval_status = approval.get("status")
@@ -180,8 +487,7 @@ def policy_check(request: PolicyCheckRequest) -> PolicyDecisionResponse:
             return PolicyDecisionResponse(decision="HOLD", approval_id=request.approval_id)
 
     if (request.require_approval or request.cost_usdc > HOLD_THRESHOLD) and approval_status != "APPROVE":
-        approval_id = f"appr_{uuid.uuid4().hex[:8]}"
-        app.state.approvals[approval_id] = {"status": "PENDING", "request": request.model_dump()}
+        approval_id = _new_approval(request.model_dump(), payload)
         _record_audit(
             AuditEvent(
                 ts=int(time.time()),
@@ -226,43 +532,308 @@ def policy_check(request: PolicyCheckRequest) -> PolicyDecisionResponse:
     return PolicyDecisionResponse(decision="ALLOW", receipt=receipt)
 
 
-@app.post("/policy/approve")
-def policy_approve(request: ApprovalDecisionRequest) -> Dict[str, str]:
-    approval = app.state.approvals.get(request.approval_id)
-    if not approval:
-        raise HTTPException(status_code=404, detail="approval_not_found")
-    approval["status"] = request.decision
+@app.post("/policy/check_batch", response_model=PolicyBatchDecisionResponse)
+def policy_check_batch(request: PolicyCheckBatchRequest) -> PolicyBatchDecisionResponse:
     try:
+        payload, grants = _decode_token(request.consent_token)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=401, detail=f"invalid_token: {exc}") from exc
+
+    jti = payload.get("jti")
+    if not jti:
+        raise HTTPException(status_code=401, detail="missing_jti")
+    if _is_revoked(jti):
+        blocked = [PolicyDecisionResponse(decision="BLOCK", reason="revoked") for _ in request.items]
+        return PolicyBatchDecisionResponse(decisions=blocked)
+    # One batch is one call against the token's rate budget.
+    retry_after = _check_rate(payload)
+    if retry_after is not None:
+        limited = [
+            PolicyDecisionResponse(decision="BLOCK", reason="rate_limited", retry_after_s=retry_after)
+            for _ in request.items
+        ]
+        return PolicyBatchDecisionResponse(decisions=limited)
+
+    # Usage is staged and only committed once the whole batch is decided; a 402 discards it.
+    with app.state.policy_state.usage(jti, _token_exp(payload)) as usage:
+        approval_status: Optional[str] = None
+        if request.approval_id:
+            approval = app.state.policy_state.get_approval(request.approval_id)
+            approval_status = approval.get("status") if approval else None
+
+        decisions: List[PolicyDecisionResponse] = []
+        held: List[PolicyCheckItem] = []
+        allowed: List[PolicyCheckItem] = []
+        for item in request.items:
+            if not grants.allows_scope(item.scope):
+                decisions.append(PolicyDecisionResponse(decision="BLOCK", reason="scope_denied"))
+                continue
+            if not grants.allows_resource(item.resource):
+                decisions.append(PolicyDecisionResponse(decision="BLOCK", reason="resource_denied"))
+                continue
+            limit_error = _ensure_limits(payload, item.action, item.bytes, usage=usage)
+            if limit_error:
+                decisions.append(PolicyDecisionResponse(decision="BLOCK", reason=limit_error))
+                continue
+            if request.approval_id:
+                if approval_status is None:
+                    decisions.append(PolicyDecisionResponse(decision="BLOCK", reason="approval_not_found"))
+                    continue
+                if approval_status == "DENY":
+                    decisions.append(PolicyDecisionResponse(decision="BLOCK", reason="approval_denied"))
+                    continue
+                if approval_status != "APPROVE":
+                    decisions.append(PolicyDecisionResponse(decision="HOLD", approval_id=request.approval_id))
+                    continue
+            needs_approval = request.require_approval or max(item.cost_usdc, request.cost_usdc) > HOLD_THRESHOLD
+            if needs_approval and approval_status != "APPROVE":
+                held.append(item)
+                decisions.append(PolicyDecisionResponse(decision="HOLD"))
+                continue
+            allowed.append(item)
+            decisions.append(PolicyDecisionResponse(decision="ALLOW"))
+
+        call_cost = request.cost_usdc if allowed else 0.0
+        total_cost = round(call_cost + sum(item.cost_usdc for item in allowed), 6)
+        if total_cost > 0 and not request.payment_proof:
+            _payment_required_response(request.tool, total_cost)
+
+        approval_id: Optional[str] = None
+        if request.approval_id and any(decision.approval_id == request.approval_id for decision in decisions):
+            # Re-polling a pending approval: echo its id, as /policy/check does.
+            approval_id = request.approval_id
+        if held:
+            approval_id = _new_approval(
+                {
+                    "tool": request.tool,
+                    "items": [item.model_dump() for item in held],
+                    "cost_usdc": request.cost_usdc + sum(item.cost_usdc for item in held),
+                },
+                payload,
+            )
+            for decision in decisions:
+                if decision.decision == "HOLD" and decision.approval_id is None:
+                    decision.approval_id = approval_id
+
+    # Audit the whole batch with one append, after the usage transaction has committed.
+    now = int(time.time())
+    events = [
+        AuditEvent(
+            ts=now,
+            event_type="policy_check",
+            user_did=payload.get("sub"),
+            agent_did=payload.get("act"),
+            jti=jti,
+            scope=item.scope,
+            resource=item.resource,
+            decision="HOLD",
+            cost_usdc=item.cost_usdc,
+            payment_ref=None,
+            details={"approval_id": approval_id, "tool": request.tool},
+        )
+        for item in held
+    ]
+    events.extend(
+        AuditEvent(
+            ts=now,
+            event_type="policy_check",
+            user_did=payload.get("sub"),
+            agent_did=payload.get("act"),
+            jti=jti,
+            scope=item.scope,
+            resource=item.resource,
+            decision="ALLOW",
+            cost_usdc=item.cost_usdc + (call_cost if index == 0 else 0.0),
+            payment_ref=request.payment_proof,
+            details={"tool": request.tool},
+        )
+        for index, item in enumerate(allowed)
+    )
+    _record_audits(events)
+
+    receipt = None
+    if allowed:
+        receipt = {
+            "tool": request.tool,
+            "amount": total_cost,
+            "asset": X402_ASSET,
+            "payment_ref": request.payment_proof,
+        }
+    return PolicyBatchDecisionResponse(decisions=decisions, approval_id=approval_id, receipt=receipt)
+
+
+def _decide_approvals(approval_ids: List[str], decision: str) -> Dict[str, Dict[str, object]]:
+    # One state transaction, one feed notification per approval and one audit append for the lot.
+    decided = app.state.policy_state.set_approval_statuses(approval_ids, decision)
+    for approval_id in decided:
+        app.state.approval_feed.publish(approval_id, decision)
+    now = int(time.time())
+    events = []
+    for approval_id, approval in decided.items():
         original = approval.get("request") or {}
-        _record_audit(
+        events.append(
             AuditEvent(
-                ts=int(time.time()),
+                ts=now,
                 event_type="approval_decision",
-                user_did=None,
-                agent_did=None,
+                user_did=approval.get("user_did"),
+                agent_did=approval.get("agent_did"),
                 jti=None,
                 scope=original.get("scope"),
                 resource=original.get("resource"),
-                decision=request.decision,
+                decision=decision,
                 cost_usdc=float(original.get("cost_usdc") or 0.0),
-                payment_ref=original.get("payment_proof"),
-                details={"approval_id": request.approval_id},
+                payment_ref=None,
+                details={"approval_id": approval_id},
             )
         )
+    try:
+        _record_audits(events)
     except Exception:
         pass
+    return decided
+
+
+@app.post("/policy/approve")
+def policy_approve(request: ApprovalDecisionRequest) -> Dict[str, str]:
+    approval = _decide_approvals([request.approval_id], request.decision).get(request.approval_id)
+    if not approval:
+        raise HTTPException(status_code=404, detail="approval_not_found")
     return {"status": approval["status"], "approval_id": request.approval_id}
 
 
+@app.post("/policy/approvals/decide")
+def policy_approvals_decide(request: ApprovalBulkDecisionRequest) -> Dict[str, object]:
+    approval_ids = list(dict.fromkeys(request.approval_ids))
+    decided = _decide_approvals(approval_ids, request.decision)
+    return {
+        "status": request.decision,
+        "decided": list(decided),
+        "not_found": [approval_id for approval_id in approval_ids if approval_id not in decided],
+    }
+
+
+@app.get("/policy/approvals", response_model=ApprovalListResponse)
+def policy_approvals(
+    status: Optional[Literal["PENDING", "APPROVE", "DENY"]] = None,
+    agent_did: Optional[str] = None,
+    user_did: Optional[str] = None,
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+) -> ApprovalListResponse:
+    filters = {"status": status, "agent_did": agent_did, "user_did": user_did}
+    approvals, next_cursor = app.state.policy_state.list_approvals(
+        {field: value for field, value in filters.items() if value is not None}, after=cursor, limit=limit
+    )
+    return ApprovalListResponse(approvals=approvals, next_cursor=next_cursor)
+
+
+@app.get("/policy/approvals/{approval_id}/wait")
+async def approval_wait(approval_id: str, wait_s: float = Query(30.0, ge=0.0)) -> Dict[str, object]:
+    # Long-poll: returns as soon as the approval is decided, or its current status at the deadline.
+    feed = app.state.approval_feed
+    deadline = time.monotonic() + min(wait_s, APPROVAL_WAIT_MAX_S)
+    while True:
+        approval = app.state.policy_state.get_approval(approval_id)
+        if approval is None:
+            raise HTTPException(status_code=404, detail="approval_not_found")
+        status = approval.get("status")
+        remaining = deadline - time.monotonic()
+        if status != "PENDING" or remaining <= 0:
+            return {"approval_id": approval_id, "status": status, "resolved": status != "PENDING"}
+        await feed.wait_for(approval_id, min(remaining, APPROVAL_WAIT_POLL_S))
+
+
+@app.get("/policy/approvals/stream")
+async def approvals_stream(
+    since: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[str] = Header(None),
+) -> StreamingResponse:
+    # Decisions made through this worker; with several workers, subscribe to each.
+    feed = app.state.approval_feed
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    start = feed.last_seq if since is None else since
+
+    async def events() -> AsyncIterator[str]:
+        cursor = start
+        while True:
+            decisions, cursor, truncated = feed.read(cursor, limit=500)
+            if truncated:
+                yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+            for decision in decisions:
+                yield f"id: {decision['seq']}\nevent: decision\ndata: {json.dumps(decision)}\n\n"
+            if not decisions and not await feed.wait(cursor, APPROVAL_STREAM_KEEPALIVE_S):
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @app.get("/audit/export.jsonl")
-def audit_export() -> PlainTextResponse:
-    lines = [json.dumps(event) for event in app.state.audit_events]
-    return PlainTextResponse("\n".join(lines))
+def audit_export(
+    since_seq: int = 0,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    jti: Optional[str] = None,
+    agent_did: Optional[str] = None,
+    decision: Optional[str] = None,
+) -> StreamingResponse:
+    # Pin the end of the export so X-Next-Seq is a safe cursor for the next pull.
+    until_seq = app.state.audit_log.next_seq - 1
+    events = app.state.audit_log.read(
+        since_seq=since_seq,
+        start_ts=start_ts,
+        end_ts=end_ts,
+        until_seq=until_seq,
+        filters={"jti": jti, "agent_did": agent_did, "decision": decision},
+    )
+    lines = (json.dumps(event) + "\n" for event in events)
+    return StreamingResponse(
+        lines,
+        media_type="application/x-ndjson",
+        headers={"X-Next-Seq": str(max(since_seq, until_seq))},
+    )
+
+
+@app.get("/audit/rollups")
+def audit_rollups(
+    granularity: Literal["minute", "hour"] = "minute",
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    group_by: str = ",".join(("bucket_ts",) + DIMENSIONS),
+) -> Dict[str, object]:
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in dimensions if name != "bucket_ts" and name not in DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown_group_by: {','.join(unknown)}")
+    _sync_rollups()
+    rows = app.state.rollups.query(granularity, start_ts=start_ts, end_ts=end_ts, group_by=dimensions)
+    return {"granularity": granularity, "bucket_seconds": GRANULARITIES[granularity], "rows": rows}
 
 
 @app.post("/webhooks/revocation")
 def revocation_webhook(event: RevocationEvent) -> Dict[str, str]:
-    app.state.revoked.add(event.jti)
+    response = {"status": "revoked", "jti": event.jti}
+    # Redeliveries return the first response without touching state or the audit log.
+    key = f"revocation:{event.idempotency_key}" if event.idempotency_key else None
+    if key:
+        cached = app.state.policy_state.claim_idempotency(key, response, time.time() + IDEMPOTENCY_TTL_S)
+        if cached is not None:
+            return cached
+    try:
+        _apply_revocation(event)
+    except Exception:
+        if key:
+            app.state.policy_state.release_idempotency(key)
+        raise
+    return response
+
+
+def _apply_revocation(event: RevocationEvent) -> None:
+    # Without an exp on the event, no token can outlive MAX_TOKEN_TTL_S from now.
+    exp = event.exp or int(time.time()) + MAX_TOKEN_TTL_S
+    _revoke(event.jti, exp)
     _record_audit(
         AuditEvent(
             ts=int(time.time()),
@@ -278,4 +849,21 @@ def revocation_webhook(event: RevocationEvent) -> Dict[str, str]:
             details={"event_type": event.event_type, "reason": event.reason},
         )
     )
-    return {"status": "revoked", "jti": event.jti}
+
+
+@app.get("/revocations/snapshot")
+def revocations_snapshot() -> Dict[str, object]:
+    return app.state.revoked.snapshot()
+
+
+@app.get("/revocations/delta")
+def revocations_delta(since_seq: int = 0, instance_id: Optional[str] = None) -> Dict[str, object]:
+    if instance_id is not None and instance_id != app.state.revoked.instance_id:
+        # Our seqs restarted, so the caller's cursor is meaningless; hand back everything.
+        return dict(app.state.revoked.snapshot(), reset=True)
+    return app.state.revoked.delta(since_seq)
+
+
+@app.post("/revocations/sync")
+def revocations_sync(request: RevocationSyncRequest) -> Dict[str, int]:
+    return {"merged": sum(1 for jti, exp in request.entries if _revoke(jti, exp))}
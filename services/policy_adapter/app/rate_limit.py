@@ -0,0 +1,41 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class TokenBucketLimiter:
+    """Per-key token bucket: ``rate_per_min`` burst capacity, refilled continuously.
+
+    Each key holds two floats (tokens left, last refill time), so memory per
+    consent token is constant regardless of how hard it is hammered.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, rate_per_min: int, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """Take ``cost`` tokens; returns 0.0 when allowed, else seconds until it would be."""
+        if rate_per_min <= 0:
+            return 0.0
+        capacity = float(rate_per_min)
+        refill_per_s = capacity / 60.0
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+            tokens = min(capacity, bucket[0] + max(0.0, now - bucket[1]) * refill_per_s)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return 0.0
+            bucket[0] = tokens
+            return (cost - tokens) / refill_per_s
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,147 @@
+import hashlib
+import math
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class RevocationStore:
+    """Revoked jtis behind time-sliced Bloom filters, backed by an exact map.
+
+    Each revocation lands in the filter generation covering its ``exp``, and a
+    generation is dropped as a whole once every token it covers has expired,
+    so filter memory is bounded by the live window rather than by history.
+    Each generation also lists the jtis added to it, so dropping one evicts
+    only its own exact entries instead of scanning the whole map.
+    Lookups that miss every filter never take the lock or touch the exact map;
+    hits are confirmed against it to rule out false positives.
+
+    Every newly learned revocation gets a local ``seq`` so peers can pull
+    deltas; ``instance_id`` changes on restart, telling peers to re-snapshot.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        window_s: int = 3600,
+        generations: int = 8,
+    ) -> None:
+        self.instance_id = uuid.uuid4().hex
+        self.generation_s = max(1, math.ceil(window_s / max(1, generations)))
+        # Sized for ``capacity`` live revocations spread across the window. A
+        # lookup probes every live generation, so each gets a share of the error budget.
+        per_generation = max(1, math.ceil(capacity / max(1, generations)))
+        per_filter_error = error_rate / (max(1, generations) + 1)
+        self.bits = max(64, math.ceil(-per_generation * math.log(per_filter_error) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / per_generation * math.log(2)))
+        self._filters: Dict[int, bytearray] = {}
+        # generation -> jtis added to it; a jti re-added with a later exp is listed in both.
+        self._generation_jtis: Dict[int, List[str]] = {}
+        # jti -> (exp, seq); insertion order is seq order.
+        self._entries: Dict[str, Tuple[int, int]] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.filter_hits = 0
+        self.false_positives = 0
+
+    def _positions(self, jti: str) -> List[int]:
+        digest = hashlib.blake2b(jti.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, jti: str, exp: int) -> bool:
+        """Record a revocation; returns False if it was already known."""
+        exp = int(exp)
+        if exp <= time.time():
+            return False
+        with self._lock:
+            current = self._entries.get(jti)
+            if current is not None and current[0] >= exp:
+                return False
+            generation = exp // self.generation_s
+            bitmap = self._filters.get(generation)
+            if bitmap is None:
+                bitmap = self._filters[generation] = bytearray((self.bits + 7) // 8)
+            self._generation_jtis.setdefault(generation, []).append(jti)
+            for position in self._positions(jti):
+                bitmap[position >> 3] |= 1 << (position & 7)
+            self._seq += 1
+            self._entries.pop(jti, None)
+            self._entries[jti] = (exp, self._seq)
+            return True
+
+    def __contains__(self, jti: object) -> bool:
+        if not isinstance(jti, str):
+            return False
+        positions = self._positions(jti)
+        for bitmap in list(self._filters.values()):
+            if all(bitmap[position >> 3] & (1 << (position & 7)) for position in positions):
+                break
+        else:
+            return False
+        with self._lock:
+            self.filter_hits += 1
+            entry = self._entries.get(jti)
+            if entry is None or entry[0] <= time.time():
+                self.false_positives += 1
+                return False
+            return True
+
+    def discard(self, jti: str) -> None:
+        with self._lock:
+            self._entries.pop(jti, None)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop filter generations and exact entries whose tokens have all expired."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [generation for generation in self._filters if (generation + 1) * self.generation_s <= now]
+            removed = 0
+            for generation in expired:
+                del self._filters[generation]
+                for jti in self._generation_jtis.pop(generation, ()):
+                    # Skip jtis since re-added to a later generation (or discarded).
+                    entry = self._entries.get(jti)
+                    if entry is not None and entry[0] <= now:
+                        del self._entries[jti]
+                        removed += 1
+        return removed
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "instance_id": self.instance_id,
+                "seq": self._seq,
+                "entries": [[jti, exp] for jti, (exp, _) in self._entries.items()],
+            }
+
+    def delta(self, since_seq: int) -> Dict[str, object]:
+        with self._lock:
+            newer: List[List[object]] = []
+            # Entries are in seq order, so walk back from the newest until the cursor.
+            for jti in reversed(self._entries):
+                exp, seq = self._entries[jti]
+                if seq <= since_seq:
+                    break
+                newer.append([jti, exp])
+            newer.reverse()
+            return {"instance_id": self.instance_id, "seq": self._seq, "entries": newer}
+
+    def merge(self, entries: Iterable[Sequence[object]]) -> int:
+        return sum(1 for jti, exp in entries if self.add(str(jti), int(exp)))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "seq": self._seq,
+                "generations": len(self._filters),
+                "filter_bytes": len(self._filters) * ((self.bits + 7) // 8),
+                "filter_hits": self.filter_hits,
+                "false_positives": self.false_positives,
+            }
@@ -0,0 +1,79 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DIMENSIONS = ("agent_did", "user_did", "tool", "decision")
+GRANULARITIES = {"minute": 60, "hour": 3600}
+
+_Key = Tuple[Optional[str], ...]
+
+
+class AuditRollups:
+    """Event counts and cost sums per (agent, user, tool, decision) in time buckets.
+
+    Updated on every audit append, so queries cost O(buckets) instead of a
+    pass over the log. Each granularity keeps its newest ``retention`` buckets.
+    """
+
+    def __init__(self, retention: Optional[Dict[str, int]] = None) -> None:
+        self.retention = {"minute": 1440, "hour": 168, **(retention or {})}
+        self._buckets: Dict[str, Dict[int, Dict[_Key, List[float]]]] = {name: {} for name in GRANULARITIES}
+        self._lock = threading.Lock()
+
+    def add(self, event: Dict[str, object]) -> None:
+        details = event.get("details") or {}
+        tool = details.get("tool") if isinstance(details, dict) else None
+        key: _Key = (event.get("agent_did"), event.get("user_did"), tool, event.get("decision"))
+        ts = int(event.get("ts") or 0)
+        cost = float(event.get("cost_usdc") or 0.0)
+        with self._lock:
+            for name, width in GRANULARITIES.items():
+                buckets = self._buckets[name]
+                start = ts - ts % width
+                bucket = buckets.get(start)
+                if bucket is None:
+                    bucket = buckets[start] = {}
+                    while len(buckets) > self.retention[name]:
+                        del buckets[min(buckets)]
+                    if start not in buckets:
+                        continue
+                totals = bucket.get(key)
+                if totals is None:
+                    totals = bucket[key] = [0, 0.0]
+                totals[0] += 1
+                totals[1] += cost
+
+    def query(
+        self,
+        granularity: str = "minute",
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        group_by: Sequence[str] = ("bucket_ts",) + DIMENSIONS,
+    ) -> List[Dict[str, object]]:
+        keep = [index for index, dimension in enumerate(DIMENSIONS) if dimension in group_by]
+        by_bucket = "bucket_ts" in group_by
+        rows: Dict[Tuple[object, ...], List[float]] = {}
+        with self._lock:
+            for start, bucket in self._buckets[granularity].items():
+                if start_ts is not None and start + GRANULARITIES[granularity] <= start_ts:
+                    continue
+                if end_ts is not None and start > end_ts:
+                    continue
+                for key, (count, cost) in bucket.items():
+                    group = ((start,) if by_bucket else ()) + tuple(key[index] for index in keep)
+                    totals = rows.setdefault(group, [0, 0.0])
+                    totals[0] += count
+                    totals[1] += cost
+
+        names = (["bucket_ts"] if by_bucket else []) + [DIMENSIONS[index] for index in keep]
+        result = []
+        for group in sorted(rows, key=lambda values: tuple((value is None, "" if value is None else value) for value in values)):
+            count, cost = rows[group]
+            row: Dict[str, object] = dict(zip(names, group))
+            row["count"] = int(count)
+            row["cost_usdc"] = round(cost, 6)
+            result.append(row)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: len(buckets) for name, buckets in self._buckets.items()}
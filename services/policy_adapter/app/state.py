@@ -0,0 +1,476 @@
+import bisect
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from .expiry import ExpiryQueue
+from .idempotency import IdempotencyTable
+from .rate_limit import TokenBucketLimiter
+
+Usage = Dict[str, int]
+# Approval record fields with a secondary index; list_approvals filters on any of them.
+APPROVAL_INDEXES = ("status", "agent_did", "user_did")
+
+
+def _empty_usage() -> Usage:
+    return {"reads": 0, "writes": 0, "bytes": 0}
+
+
+class PolicyState(ABC):
+    """Usage counters, rate buckets, approvals and revocations behind the policy checks.
+
+    ``usage`` is a transaction: the caller checks and mutates the yielded
+    counters, which are committed atomically when the block exits and
+    discarded if it raises. Every entry carries a deadline and is dropped by
+    ``expire`` once it passes.
+    """
+
+    @abstractmethod
+    def usage(self, jti: str, exp: float) -> ContextManager[Usage]:
+        ...
+
+    @abstractmethod
+    def acquire_rate(self, key: str, rate_per_min: int, exp: float, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens from the key's bucket; returns seconds to wait, 0.0 if allowed."""
+
+    @abstractmethod
+    def create_approval(self, approval_id: str, record: Dict[str, object], expires_at: float) -> None:
+        ...
+
+    @abstractmethod
+    def get_approval(self, approval_id: str) -> Optional[Dict[str, object]]:
+        ...
+
+    def set_approval_status(self, approval_id: str, status: str) -> Optional[Dict[str, object]]:
+        return self.set_approval_statuses([approval_id], status).get(approval_id)
+
+    @abstractmethod
+    def set_approval_statuses(self, approval_ids: Sequence[str], status: str) -> Dict[str, Dict[str, object]]:
+        """Decide several approvals atomically; returns the updated records of those that exist."""
+
+    @abstractmethod
+    def list_approvals(
+        self, filters: Dict[str, str], after: Optional[int] = None, limit: int = 100
+    ) -> Tuple[List[Dict[str, object]], Optional[int]]:
+        """Live approvals matching ``filters`` (APPROVAL_INDEXES fields) in creation order.
+
+        Each record carries its ``approval_id`` and ``seq``; pass the returned
+        cursor as ``after`` for the next page, ``None`` means there is none.
+        """
+
+    def add_revocation(self, jti: str, exp: int) -> None:
+        """Publish a revocation to the other processes sharing this state."""
+
+    def revocations_since(self, seq: int) -> Tuple[List[Tuple[str, int]], int]:
+        """Revocations published after ``seq`` and the cursor to pass next time."""
+        return [], seq
+
+    @abstractmethod
+    def claim_idempotency(self, key: str, response: Dict[str, object], expires_at: float) -> Optional[Dict[str, object]]:
+        """Record ``response`` for ``key`` unless already claimed; returns the earlier response if so."""
+
+    @abstractmethod
+    def release_idempotency(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def expire(self, now: Optional[float] = None, limit: int = 500) -> int:
+        ...
+
+    def stats(self) -> Dict[str, object]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryPolicyState(PolicyState):
+    """Per-process state; quotas are only enforced correctly with a single worker."""
+
+    def __init__(self, idempotency_max_keys: int = 100000) -> None:
+        self._usage: Dict[str, Usage] = {}
+        self._approvals: Dict[str, Dict[str, object]] = {}
+        # Approvals get a creation seq; each index maps (field, value) to ascending seqs.
+        self._approval_seq = 0
+        self._approval_ids: Dict[int, str] = {}
+        self._approval_index: Dict[Tuple[str, str], List[int]] = {}
+        self._idempotency = IdempotencyTable(max_entries=idempotency_max_keys)
+        self._rate_limiter = TokenBucketLimiter()
+        self._expiry = ExpiryQueue()
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def usage(self, jti: str, exp: float) -> Iterator[Usage]:
+        with self._lock:
+            staged = dict(self._usage.get(jti) or _empty_usage())
+            yield staged
+            self._usage[jti] = staged
+        self._expiry.schedule(("usage", jti), exp)
+
+    def acquire_rate(self, key: str, rate_per_min: int, exp: float, cost: float = 1.0) -> float:
+        self._expiry.schedule(("rate", key), exp)
+        return self._rate_limiter.acquire(key, rate_per_min, cost)
+
+    def _index_keys(self, record: Dict[str, object]) -> List[Tuple[str, str]]:
+        keys = [("", "")]
+        for field in APPROVAL_INDEXES:
+            value = record.get(field)
+            if value is not None:
+                keys.append((field, str(value)))
+        return keys
+
+    def _index_add(self, key: Tuple[str, str], seq: int) -> None:
+        seqs = self._approval_index.setdefault(key, [])
+        if not seqs or seqs[-1] < seq:
+            seqs.append(seq)
+        else:
+            bisect.insort(seqs, seq)
+
+    def _index_remove(self, key: Tuple[str, str], seq: int) -> None:
+        seqs = self._approval_index.get(key)
+        if not seqs:
+            return
+        position = bisect.bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq:
+            del seqs[position]
+        if not seqs:
+            del self._approval_index[key]
+
+    def create_approval(self, approval_id: str, record: Dict[str, object], expires_at: float) -> None:
+        with self._lock:
+            self._approval_seq += 1
+            record = dict(record, seq=self._approval_seq)
+            self._approvals[approval_id] = record
+            self._approval_ids[self._approval_seq] = approval_id
+            for key in self._index_keys(record):
+                self._index_add(key, self._approval_seq)
+        self._expiry.schedule(("approval", approval_id), expires_at)
+
+    def _drop_approval(self, approval_id: str) -> None:
+        record = self._approvals.pop(approval_id, None)
+        if record is None:
+            return
+        seq = int(record["seq"])
+        del self._approval_ids[seq]
+        for key in self._index_keys(record):
+            self._index_remove(key, seq)
+
+    def get_approval(self, approval_id: str) -> Optional[Dict[str, object]]:
+        with self._lock:
+            record = self._approvals.get(approval_id)
+            return dict(record) if record is not None else None
+
+    def set_approval_statuses(self, approval_ids: Sequence[str], status: str) -> Dict[str, Dict[str, object]]:
+        updated: Dict[str, Dict[str, object]] = {}
+        with self._lock:
+            for approval_id in approval_ids:
+                record = self._approvals.get(approval_id)
+                if record is None:
+                    continue
+                if record.get("status") != status:
+                    seq = int(record["seq"])
+                    self._index_remove(("status", str(record.get("status"))), seq)
+                    record["status"] = status
+                    self._index_add(("status", status), seq)
+                updated[approval_id] = dict(record)
+        return updated
+
+    def list_approvals(
+        self, filters: Dict[str, str], after: Optional[int] = None, limit: int = 100
+    ) -> Tuple[List[Dict[str, object]], Optional[int]]:
+        filters = {field: str(value) for field, value in filters.items() if value is not None}
+        with self._lock:
+            # Walk the most selective index and check the remaining filters per record.
+            candidates = [self._approval_index.get(key, []) for key in filters.items()] or [
+                self._approval_index.get(("", ""), [])
+            ]
+            seqs = min(candidates, key=len)
+            records: List[Dict[str, object]] = []
+            for position in range(bisect.bisect_right(seqs, after or 0), len(seqs)):
+                approval_id = self._approval_ids[seqs[position]]
+                record = self._approvals[approval_id]
+                if any(str(record.get(field)) != value for field, value in filters.items()):
+                    continue
+                if len(records) == limit:
+                    return records, int(records[-1]["seq"])
+                records.append(dict(record, approval_id=approval_id))
+        return records, None
+
+    def claim_idempotency(self, key: str, response: Dict[str, object], expires_at: float) -> Optional[Dict[str, object]]:
+        return self._idempotency.claim(key, response, expires_at)
+
+    def release_idempotency(self, key: str) -> None:
+        self._idempotency.release(key)
+
+    def expire(self, now: Optional[float] = None, limit: int = 500) -> int:
+        # Idempotency entries expire in insertion order and need no heap of their own.
+        removed = self._idempotency.expire(now, limit=limit)
+        due = self._expiry.pop_due(now, limit=limit)
+        with self._lock:
+            for kind, key in due:
+                if kind == "usage":
+                    self._usage.pop(key, None)
+                elif kind == "rate":
+                    self._rate_limiter.discard(key)
+                elif kind == "approval":
+                    self._drop_approval(key)
+        return removed + len(due)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "usage": len(self._usage),
+                "approvals": len(self._approvals),
+                "rate_buckets": len(self._rate_limiter),
+                "idempotency": self._idempotency.stats(),
+                "expiry": self._expiry.stats(),
+            }
+
+
+class SQLitePolicyState(PolicyState):
+    """State in a WAL-mode SQLite file shared by every worker on the host.
+
+    Read-check-write sequences run inside ``BEGIN IMMEDIATE``, which holds the
+    database write lock, so concurrent workers cannot both spend the last unit
+    of a quota.
+    """
+
+    def __init__(self, path: str, busy_timeout_s: float = 5.0, idempotency_max_keys: int = 100000) -> None:
+        self.path = path
+        self.idempotency_max_keys = idempotency_max_keys
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=busy_timeout_s)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # One connection per process; the RLock lets usage() callers create approvals inside their transaction.
+        self._lock = threading.RLock()
+        with self._txn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                " jti TEXT PRIMARY KEY, reads INTEGER NOT NULL, writes INTEGER NOT NULL,"
+                " bytes INTEGER NOT NULL, exp REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                " key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL, exp REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS approvals ("
+                " approval_id TEXT PRIMARY KEY, status TEXT NOT NULL, record TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, agent_did TEXT, user_did TEXT)"
+            )
+            # State files from before the approval indexes lack these columns.
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(approvals)")}
+            for column in ("agent_did", "user_did"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE approvals ADD COLUMN {column} TEXT")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revocations ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, jti TEXT NOT NULL UNIQUE, exp INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL UNIQUE, response TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            for table, column in (
+                ("usage", "exp"),
+                ("rate_buckets", "exp"),
+                ("approvals", "expires_at"),
+                ("revocations", "exp"),
+                ("idempotency", "expires_at"),
+            ) + tuple(("approvals", field) for field in APPROVAL_INDEXES):
+                # SQLite indexes end in the rowid, so "field = ? AND rowid > ?" pages straight off them.
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})")
+
+    @contextmanager
+    def _txn(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            if self._conn.in_transaction:
+                yield self._conn
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def usage(self, jti: str, exp: float) -> Iterator[Usage]:
+        with self._txn() as conn:
+            row = conn.execute("SELECT reads, writes, bytes FROM usage WHERE jti = ?", (jti,)).fetchone()
+            staged = dict(zip(("reads", "writes", "bytes"), row)) if row else _empty_usage()
+            yield staged
+            conn.execute(
+                "INSERT INTO usage (jti, reads, writes, bytes, exp) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(jti) DO UPDATE SET reads = excluded.reads, writes = excluded.writes, "
+                "bytes = excluded.bytes",
+                (jti, staged["reads"], staged["writes"], staged["bytes"], exp),
+            )
+
+    def acquire_rate(self, key: str, rate_per_min: int, exp: float, cost: float = 1.0) -> float:
+        # Same refill arithmetic as TokenBucketLimiter, with the bucket row as the shared state.
+        if rate_per_min <= 0:
+            return 0.0
+        capacity = float(rate_per_min)
+        refill_per_s = capacity / 60.0
+        now = time.time()
+        with self._txn() as conn:
+            row = conn.execute("SELECT tokens, ts FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, last = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - last) * refill_per_s)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / refill_per_s
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, ts, exp) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, ts = excluded.ts",
+                (key, tokens, now, exp),
+            )
+        return wait
+
+    def create_approval(self, approval_id: str, record: Dict[str, object], expires_at: float) -> None:
+        with self._txn() as conn:
+            conn.execute(
+                "INSERT INTO approvals (approval_id, status, record, expires_at, agent_did, user_did)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    approval_id,
+                    record.get("status"),
+                    json.dumps(record),
+                    expires_at,
+                    record.get("agent_did"),
+                    record.get("user_did"),
+                ),
+            )
+
+    def get_approval(self, approval_id: str) -> Optional[Dict[str, object]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM approvals WHERE approval_id = ? AND expires_at > ?", (approval_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_approval_statuses(self, approval_ids: Sequence[str], status: str) -> Dict[str, Dict[str, object]]:
+        updated: Dict[str, Dict[str, object]] = {}
+        now = time.time()
+        with self._txn() as conn:
+            for approval_id in approval_ids:
+                row = conn.execute(
+                    "SELECT record FROM approvals WHERE approval_id = ? AND expires_at > ?", (approval_id, now)
+                ).fetchone()
+                if row is None:
+                    continue
+                record = json.loads(row[0])
+                record["status"] = status
+                conn.execute(
+                    "UPDATE approvals SET status = ?, record = ? WHERE approval_id = ?",
+                    (status, json.dumps(record), approval_id),
+                )
+                updated[approval_id] = record
+        return updated
+
+    def list_approvals(
+        self, filters: Dict[str, str], after: Optional[int] = None, limit: int = 100
+    ) -> Tuple[List[Dict[str, object]], Optional[int]]:
+        clauses = ["expires_at > ?", "rowid > ?"]
+        params: List[object] = [time.time(), after or 0]
+        for field, value in filters.items():
+            if field in APPROVAL_INDEXES and value is not None:
+                clauses.append(f"{field} = ?")
+                params.append(str(value))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT rowid, approval_id, record FROM approvals WHERE {' AND '.join(clauses)} "
+                "ORDER BY rowid LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        records = [dict(json.loads(record), approval_id=approval_id, seq=seq) for seq, approval_id, record in rows[:limit]]
+        return records, (int(rows[limit - 1][0]) if len(rows) > limit else None)
+
+    def add_revocation(self, jti: str, exp: int) -> None:
+        with self._txn() as conn:
+            row = conn.execute("SELECT exp FROM revocations WHERE jti = ?", (jti,)).fetchone()
+            if row is not None and row[0] >= exp:
+                return
+            # Re-insert rather than update so the change gets a new seq and other workers pick it up.
+            conn.execute("DELETE FROM revocations WHERE jti = ?", (jti,))
+            conn.execute("INSERT INTO revocations (jti, exp) VALUES (?, ?)", (jti, int(exp)))
+
+    def revocations_since(self, seq: int) -> Tuple[List[Tuple[str, int]], int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, jti, exp FROM revocations WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        if not rows:
+            return [], seq
+        return [(jti, exp) for _, jti, exp in rows], rows[-1][0]
+
+    def claim_idempotency(self, key: str, response: Dict[str, object], expires_at: float) -> Optional[Dict[str, object]]:
+        with self._txn() as conn:
+            row = conn.execute(
+                "SELECT response FROM idempotency WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            if row is not None:
+                return json.loads(row[0])
+            # Drop an expired claim the sweeper has not reached yet.
+            conn.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+            cursor = conn.execute(
+                "INSERT INTO idempotency (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(response), expires_at),
+            )
+            # seq only grows, so everything more than max keys behind the newest claim is the oldest overflow.
+            conn.execute("DELETE FROM idempotency WHERE seq <= ?", (cursor.lastrowid - self.idempotency_max_keys,))
+        return None
+
+    def release_idempotency(self, key: str) -> None:
+        with self._txn() as conn:
+            conn.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+
+    def expire(self, now: Optional[float] = None, limit: int = 500) -> int:
+        now = time.time() if now is None else now
+        removed = 0
+        with self._txn() as conn:
+            for table, column, key in (
+                ("usage", "exp", "jti"),
+                ("rate_buckets", "exp", "key"),
+                ("approvals", "expires_at", "approval_id"),
+                ("revocations", "exp", "jti"),
+                ("idempotency", "expires_at", "key"),
+            ):
+                removed += conn.execute(
+                    f"DELETE FROM {table} WHERE {key} IN (SELECT {key} FROM {table} WHERE {column} <= ? LIMIT ?)",
+                    (now, limit),
+                ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counts = {
+                table: self._conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                for table in ("usage", "rate_buckets", "approvals", "revocations", "idempotency")
+            }
+        return {"backend": "sqlite", **counts}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_policy_state(url: str, idempotency_max_keys: int = 100000) -> PolicyState:
+    """Build policy state from ``memory://`` or ``sqlite:///path/to.db``."""
+    scheme = urlparse(url).scheme if url else "memory"
+    if scheme == "memory":
+        return MemoryPolicyState(idempotency_max_keys=idempotency_max_keys)
+    if scheme == "sqlite":
+        return SQLitePolicyState(url[len("sqlite:///") :], idempotency_max_keys=idempotency_max_keys)
+    raise ValueError(f"unsupported policy state url: {url}")
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class ChangeFeed:
+    """Bounded ring buffer of vault changes, one entry per written key.
+
+    Entries get a monotonically increasing ``seq``; slot ``seq % capacity``
+    holds the entry, so cursor lookups are O(1) and memory stays fixed. A
+    cursor older than the buffer is reported as truncated so consumers know
+    to drop their caches and resync.
+    """
+
+    def __init__(self, capacity: int = 10000) -> None:
+        self.capacity = max(1, capacity)
+        self._ring: List[Optional[Dict[str, object]]] = [None] * self.capacity
+        self._next_seq = 1
+        self._lock = threading.Lock()
+        self._changed = asyncio.Event()
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def publish(self, subject: str, versions: Dict[str, int]) -> int:
+        # Must run on the event loop that awaits wait(); vault writes are async endpoints.
+        now = int(time.time())
+        with self._lock:
+            for key, version in versions.items():
+                seq = self._next_seq
+                self._ring[seq % self.capacity] = {
+                    "seq": seq,
+                    "subject": subject,
+                    "key": key,
+                    "version": version,
+                    "ts": now,
+                }
+                self._next_seq += 1
+            last_seq = self._next_seq - 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return last_seq
+
+    def read(
+        self, since_seq: int, subject: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[Dict[str, object]], int, bool]:
+        """Return (entries after ``since_seq``, next cursor, truncated).
+
+        The cursor advances past entries of other subjects too, so filtered
+        consumers never rescan them.
+        """
+        with self._lock:
+            last_seq = self._next_seq - 1
+            oldest_seq = max(1, self._next_seq - self.capacity)
+            truncated = since_seq + 1 < oldest_seq
+            seq = max(since_seq + 1, oldest_seq)
+            entries: List[Dict[str, object]] = []
+            while seq <= last_seq and len(entries) < limit:
+                entry = self._ring[seq % self.capacity]
+                if subject is None or entry["subject"] == subject:
+                    entries.append(entry)
+                seq += 1
+        return entries, max(since_seq, seq - 1), truncated
+
+    async def wait(self, since_seq: int, timeout: float) -> bool:
+        """Wait until something newer than ``since_seq`` is published."""
+        if self.last_seq > since_seq:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "entries": min(self._next_seq - 1, self.capacity),
+                "last_seq": self._next_seq - 1,
+            }
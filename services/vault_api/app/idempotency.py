@@ -0,0 +1,70 @@
+# Vendored into services/policy_adapter/app and services/vault_api/app, which deploy separately;
+# keep both copies identical (scripts/check_vendored.sh).
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class IdempotencyTable:
+    """Bounded map of idempotency key -> the response first returned for it.
+
+    ``claim`` records the response before the caller does the work, so a
+    concurrent redelivery of the same key gets the cached response instead
+    of racing the first one; ``release`` forgets a claim whose work failed.
+    Entries are kept in insertion order, which with a fixed TTL is deadline
+    order, so both TTL expiry and the size bound pop from the front.
+    """
+
+    def __init__(self, max_entries: int = 100000) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict[str, object], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def claim(self, key: str, response: Dict[str, object], expires_at: float) -> Optional[Dict[str, object]]:
+        """Store ``response`` under ``key`` unless a live entry exists; returns that entry's response."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return dict(entry[0])
+            self._entries[key] = (dict(response), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+        return None
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def expire(self, now: Optional[float] = None, limit: int = 500) -> int:
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            while self._entries and removed < limit:
+                key, (_, expires_at) = next(iter(self._entries.items()))
+                if expires_at > now:
+                    break
+                del self._entries[key]
+                removed += 1
+            self.expired += removed
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
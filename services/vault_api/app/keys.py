@@ -0,0 +1,185 @@
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+
+def _b64url_encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64url_decode(value: str) -> bytes:
+    padding = "=" * (-len(value) % 4)
+    return base64.urlsafe_b64decode(value + padding)
+
+
+def _private_bytes(key: ed25519.Ed25519PrivateKey) -> str:
+    return _b64url_encode(
+        key.private_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PrivateFormat.Raw,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+    )
+
+
+def _private_key(value: str) -> ed25519.Ed25519PrivateKey:
+    return ed25519.Ed25519PrivateKey.from_private_bytes(_b64url_decode(value))
+
+
+def _new_kid() -> str:
+    return f"wv_jwks_{uuid.uuid4().hex[:8]}"
+
+
+class SigningKeyRing:
+    """Ed25519 signing keys published as a JWKS, rotated on a schedule.
+
+    The ring always holds an active key plus a pre-published next key, so a
+    verifier whose JWKS copy is up to one rotation old already knows the kid
+    that will sign next. A rotated-out key stays in the JWKS for ``retain_s``
+    (the longest token lifetime) so tokens it signed keep verifying.
+
+    With ``path`` set the ring is written there (mode 0600) after every
+    change and reloaded from it on start, so a restart keeps signing with
+    the same keys instead of orphaning tokens signed since the last rotation.
+    """
+
+    def __init__(
+        self,
+        initial_key: Optional[ed25519.Ed25519PrivateKey] = None,
+        initial_kid: Optional[str] = None,
+        retain_s: float = 3600,
+        path: Optional[str] = None,
+    ) -> None:
+        self.retain_s = retain_s
+        self.path = path
+        self._lock = threading.Lock()
+        self._active: Tuple[str, ed25519.Ed25519PrivateKey] = (
+            initial_kid or _new_kid(),
+            initial_key or ed25519.Ed25519PrivateKey.generate(),
+        )
+        self._next: Tuple[str, ed25519.Ed25519PrivateKey] = (_new_kid(), ed25519.Ed25519PrivateKey.generate())
+        # kid -> (key, retire_at) for keys that no longer sign but still verify.
+        self._retired: Dict[str, Tuple[ed25519.Ed25519PrivateKey, float]] = {}
+        self._jwks = self._build_jwks()
+        self.rotations = 0
+        self.rotated_at = time.time()
+        if path and os.path.exists(path):
+            self._load()
+        elif path:
+            self._save()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+        self._active = (state["active"]["kid"], _private_key(state["active"]["key"]))
+        self._next = (state["next"]["kid"], _private_key(state["next"]["key"]))
+        self._retired = {
+            entry["kid"]: (_private_key(entry["key"]), float(entry["retire_at"])) for entry in state["retired"]
+        }
+        self.rotations = int(state.get("rotations", 0))
+        self.rotated_at = float(state.get("rotated_at", self.rotated_at))
+        self._prune(time.time())
+        self._jwks = self._build_jwks()
+
+    def _save(self) -> None:
+        # Caller holds self._lock. Renamed into place so a crash never leaves a partial ring behind.
+        state = {
+            "active": {"kid": self._active[0], "key": _private_bytes(self._active[1])},
+            "next": {"kid": self._next[0], "key": _private_bytes(self._next[1])},
+            "retired": [
+                {"kid": kid, "key": _private_bytes(key), "retire_at": retire_at}
+                for kid, (key, retire_at) in self._retired.items()
+            ],
+            "rotations": self.rotations,
+            "rotated_at": self.rotated_at,
+        }
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self.path)
+
+    def active(self) -> Tuple[str, ed25519.Ed25519PrivateKey]:
+        return self._active
+
+    def public_key(self, kid: str) -> Optional[ed25519.Ed25519PublicKey]:
+        with self._lock:
+            if kid == self._active[0]:
+                return self._active[1].public_key()
+            if kid == self._next[0]:
+                return self._next[1].public_key()
+            retired = self._retired.get(kid)
+            return retired[0].public_key() if retired is not None else None
+
+    def rotate(self, now: Optional[float] = None) -> str:
+        """Promote the pre-published key, publish a fresh next key; returns the new active kid."""
+        now = time.time() if now is None else now
+        with self._lock:
+            kid, key = self._active
+            self._retired[kid] = (key, now + self.retain_s)
+            self._active = self._next
+            self._next = (_new_kid(), ed25519.Ed25519PrivateKey.generate())
+            self._prune(now)
+            self._jwks = self._build_jwks()
+            self.rotations += 1
+            self.rotated_at = now
+            if self.path:
+                self._save()
+            return self._active[0]
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            removed = self._prune(now)
+            if removed:
+                self._jwks = self._build_jwks()
+                if self.path:
+                    self._save()
+            return removed
+
+    def _prune(self, now: float) -> int:
+        expired = [kid for kid, (_, retire_at) in self._retired.items() if retire_at <= now]
+        for kid in expired:
+            del self._retired[kid]
+        return len(expired)
+
+    def _build_jwks(self) -> Dict[str, List[Dict[str, str]]]:
+        keys = [self._active, self._next] + [(kid, key) for kid, (key, _) in self._retired.items()]
+        return {"keys": [_jwk(kid, key.public_key()) for kid, key in keys]}
+
+    def jwks(self) -> Dict[str, List[Dict[str, str]]]:
+        return self._jwks
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "active_kid": self._active[0],
+                "next_kid": self._next[0],
+                "retired": len(self._retired),
+                "rotations": self.rotations,
+                "rotated_at": int(self.rotated_at),
+            }
+
+
+def _jwk(kid: str, public_key: ed25519.Ed25519PublicKey) -> Dict[str, str]:
+    public_bytes = public_key.public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw,
+    )
+    return {
+        "kty": "OKP",
+        "crv": "Ed25519",
+        "x": _b64url_encode(public_bytes),
+        "kid": kid,
+        "alg": "EdDSA",
+        "use": "sig",
+    }
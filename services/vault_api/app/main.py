@@ -1,22 +1,91 @@
+import asyncio
 import base64
+import hashlib
+import hmac
+import json
 import os
+import sys
+import threading
 import time
 import uuid
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import jwt
-from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import ed25519
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from .change_feed import ChangeFeed
+from .expiry import ExpiryQueue
+from .idempotency import IdempotencyTable
+from .keys import SigningKeyRing
+from .registry import ScopeRegistry
+from .storage import VersionConflict, create_store
+from .token_cache import TokenCache
 
 ISSUER_DID = os.getenv("JWT_ISSUER_DID", "did:wv:issuer:main")
 AUDIENCE = os.getenv("JWT_AUDIENCE", "memmachine-policy-adapter")
 JWKS_KID = os.getenv("JWKS_KID", "wv_jwks_1")
+# File the signing key ring is persisted to; empty keeps it in memory and disables rotation,
+# since a restart would otherwise lose every key rotated in since JWT_ED25519_PRIVATE_KEY_B64.
+JWKS_KEY_STORE = os.getenv("JWKS_KEY_STORE", "")
+# 0 disables scheduled rotation; POST /keys/rotate still works when JWKS_KEY_STORE is set.
+JWKS_ROTATE_INTERVAL_S = float(os.getenv("JWKS_ROTATE_INTERVAL_S", "86400"))
+JWKS_CACHE_MAX_AGE_S = int(os.getenv("JWKS_CACHE_MAX_AGE_S", "300"))
+# Rotated-out keys stay published this long; must cover the longest consent TTL.
+JWKS_RETAIN_S = float(os.getenv("JWKS_RETAIN_S", "3600"))
+# Sent as X-Admin-Token to operator endpoints; empty disables them.
+VAULT_ADMIN_TOKEN = os.getenv("VAULT_ADMIN_TOKEN", "")
+SWEEP_INTERVAL_S = float(os.getenv("SWEEP_INTERVAL_S", "1.0"))
+SWEEP_BATCH = int(os.getenv("SWEEP_BATCH", "500"))
+VAULT_STORE_URL = os.getenv("VAULT_STORE_URL", "memory://")
+# Compact tokens encode bit positions in this registry, so it is persisted; empty keeps it in memory.
+SCOPE_REGISTRY_PATH = os.getenv("SCOPE_REGISTRY_PATH", ".scope_registry.jsonl")
+SCOPE_REGISTRY_MAX_ENTRIES = int(os.getenv("SCOPE_REGISTRY_MAX_ENTRIES", "10000"))
+VAULT_DB_POOL_MIN = int(os.getenv("VAULT_DB_POOL_MIN", "1"))
+VAULT_DB_POOL_MAX = int(os.getenv("VAULT_DB_POOL_MAX", "10"))
+VAULT_SEED_DEMO = os.getenv("VAULT_SEED_DEMO", "true").lower() == "true"
+VAULT_DEMO_SUBJECTS = [
+    subject.strip()
+    for subject in os.getenv("VAULT_DEMO_SUBJECTS", "did:wv:user:alex_rivera_0x4f2a,did:wv:user:demo").split(",")
+    if subject.strip()
+]
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+CONSENT_BATCH_MAX = int(os.getenv("CONSENT_BATCH_MAX", "5000"))
+CONSENT_SIGN_WORKERS = int(os.getenv("CONSENT_SIGN_WORKERS", str(os.cpu_count() or 4)))
+CHANGE_FEED_CAPACITY = int(os.getenv("CHANGE_FEED_CAPACITY", "10000"))
+CHANGE_FEED_MAX_WAIT_S = float(os.getenv("CHANGE_FEED_MAX_WAIT_S", "30"))
+CHANGE_FEED_KEEPALIVE_S = float(os.getenv("CHANGE_FEED_KEEPALIVE_S", "15"))
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+
+DEMO_VAULT_DATA = {
+    # Profile data (sensitive, charged per read)
+    "profile.name": "Alex Rivera",
+    "profile.email": "alex.rivera@techflow.systems",
+    "profile.company": "TechFlow Systems",
+    "profile.role": "Sales Director",
+    "profile.linkedin": "linkedin.com/in/alexrivera",
+
+    # Preferences (low-cost reads, high-cost writes)
+    "prefs.outreach_tone": "direct, friendly, data-driven",
+    "prefs.writing_style": "no emojis, brief paragraphs, bullet points for complex info",
+    "prefs.meeting_times": "Tuesdays/Thursdays 2-4pm PST",
+    "prefs.follow_up_cadence": "3 days initial, 7 days thereafter",
+
+    # Behavioral insights (premium tier)
+    "insights.response_rate": "68% within 24h",
+    "insights.preferred_channels": "email > linkedin > phone",
+}
 
 
-def _b64url_encode(raw: bytes) -> str:
-    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+def _scope_for_key(key: str, action: str) -> str:
+    # Mirrors the scope names the MCP server requests for each vault key.
+    namespace, _, field = key.partition(".")
+    return f"{namespace}:{field}.{action}"
 
 
 def _b64url_decode(value: str) -> bytes:
@@ -24,30 +93,11 @@ def _b64url_decode(value: str) -> bytes:
     return base64.urlsafe_b64decode(value + padding)
 
 
-def _load_signing_key() -> ed25519.Ed25519PrivateKey:
+def _load_signing_key() -> Optional[ed25519.Ed25519PrivateKey]:
     key_b64 = os.getenv("JWT_ED25519_PRIVATE_KEY_B64")
     if key_b64:
         return ed25519.Ed25519PrivateKey.from_private_bytes(_b64url_decode(key_b64))
-    return ed25519.Ed25519PrivateKey.generate()
-
-
-def _build_jwks(public_key: ed25519.Ed25519PublicKey) -> Dict[str, List[Dict[str, str]]]:
-    public_bytes = public_key.public_bytes(
-        encoding=serialization.Encoding.Raw,
-        format=serialization.PublicFormat.Raw,
-    )
-    return {
-        "keys": [
-            {
-                "kty": "OKP",
-                "crv": "Ed25519",
-                "x": _b64url_encode(public_bytes),
-                "kid": JWKS_KID,
-                "alg": "EdDSA",
-                "use": "sig",
-            }
-        ]
-    }
+    return None
 
 
 class ConsentLimits(BaseModel):
@@ -65,6 +115,8 @@ class ConsentIssueRequest(BaseModel):
     purpose: str
     limits: ConsentLimits
     ttl_seconds: int = Field(600, ge=60, le=3600)
+    # Encode scp/res as bitmaps against the published scope registry instead of string lists.
+    compact: bool = False
 
 
 class ConsentIssueResponse(BaseModel):
@@ -74,6 +126,24 @@ class ConsentIssueResponse(BaseModel):
     payload: Dict[str, object]
 
 
+class ConsentIssueBatchRequest(BaseModel):
+    # Items are validated one by one so a malformed entry only fails its own slot.
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=CONSENT_BATCH_MAX)
+
+
+class ConsentIssueBatchItem(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[ConsentIssueResponse] = None
+    error: Optional[str] = None
+
+
+class ConsentIssueBatchResponse(BaseModel):
+    results: List[ConsentIssueBatchItem]
+    issued: int
+    failed: int
+
+
 class RevokeRequest(BaseModel):
     jti: str
     reason: Optional[str] = "user_revoked"
@@ -84,46 +154,109 @@ class VaultReadRequest(BaseModel):
     keys: List[str]
 
 
+class VaultScanRequest(BaseModel):
+    prefix: str = ""
+    start_after: Optional[str] = None
+    end: Optional[str] = None
+    limit: int = Field(100, ge=1, le=1000)
+
+
+class VaultScanResponse(BaseModel):
+    values: Dict[str, str]
+    versions: Dict[str, int] = Field(default_factory=dict)
+    next_cursor: Optional[str] = None
+
+
 class VaultWriteRequest(BaseModel):
     updates: Dict[str, str]
+    # Compare-and-swap: key -> version the caller last read (0 = key must not exist yet).
+    expected_versions: Optional[Dict[str, int]] = None
 
 
 class VaultReadResponse(BaseModel):
     values: Dict[str, Optional[str]]
+    versions: Dict[str, int] = Field(default_factory=dict)
 
 
 class VaultWriteResponse(BaseModel):
     updated_keys: List[str]
+    versions: Dict[str, int] = Field(default_factory=dict)
+
+
+class VaultChangesResponse(BaseModel):
+    changes: List[Dict[str, object]]
+    next_cursor: int
+    # The cursor fell out of the ring buffer; cached values for this subject may be stale.
+    truncated: bool = False
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await app.state.vault_store.open()
+    if VAULT_SEED_DEMO:
+        for subject in VAULT_DEMO_SUBJECTS:
+            await app.state.vault_store.seed(subject, DEMO_VAULT_DATA)
+    tasks = [asyncio.create_task(_sweep_loop())]
+    if JWKS_ROTATE_INTERVAL_S > 0 and JWKS_KEY_STORE:
+        tasks.append(asyncio.create_task(_rotate_loop()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await app.state.vault_store.close()
+        app.state.sign_pool.shutdown(wait=False)
 
-app = FastAPI(title="World Vault API", version="0.1.0")
 
-signing_key = _load_signing_key()
-public_key = signing_key.public_key()
-app.state.signing_key = signing_key
-app.state.jwks = _build_jwks(public_key)
+app = FastAPI(title="World Vault API", version="0.1.0", lifespan=lifespan)
+
+# The configured key (if any) signs until the first rotation, under JWKS_KID; a persisted ring takes precedence.
+app.state.keys = SigningKeyRing(
+    _load_signing_key(), JWKS_KID, retain_s=JWKS_RETAIN_S, path=JWKS_KEY_STORE or None
+)
 
 # Demo in-memory stores
 app.state.consents = {}
 app.state.revoked = set()
-app.state.vault_data = {
-    # Profile data (sensitive, charged per read)
-    "profile.name": "Alex Rivera",
-    "profile.email": "alex.rivera@techflow.systems",
-    "profile.company": "TechFlow Systems",
-    "profile.role": "Sales Director",
-    "profile.linkedin": "linkedin.com/in/alexrivera",
-
-    # Preferences (low-cost reads, high-cost writes)
-    "prefs.outreach_tone": "direct, friendly, data-driven",
-    "prefs.writing_style": "no emojis, brief paragraphs, bullet points for complex info",
-    "prefs.meeting_times": "Tuesdays/Thursdays 2-4pm PST",
-    "prefs.follow_up_cadence": "3 days initial, 7 days thereafter",
-
-    # Behavioral insights (premium tier)
-    "insights.response_rate": "68% within 24h",
-    "insights.preferred_channels": "email > linkedin > phone",
-}
+app.state.expiry = ExpiryQueue()
+app.state.idempotency = IdempotencyTable(max_entries=IDEMPOTENCY_MAX_KEYS)
+app.state.lock = threading.Lock()
+app.state.token_cache = TokenCache(max_entries=TOKEN_CACHE_SIZE)
+app.state.vault_store = create_store(VAULT_STORE_URL, pool_min=VAULT_DB_POOL_MIN, pool_max=VAULT_DB_POOL_MAX)
+app.state.change_feed = ChangeFeed(capacity=CHANGE_FEED_CAPACITY)
+app.state.registry = ScopeRegistry(SCOPE_REGISTRY_PATH or None, max_entries=SCOPE_REGISTRY_MAX_ENTRIES)
+# Seed version 1 deterministically; a persisted registry already has it and this is a no-op.
+app.state.registry.register(
+    [_scope_for_key(key, "read") for key in DEMO_VAULT_DATA]
+    + [_scope_for_key(key, "write") for key in DEMO_VAULT_DATA if key.startswith("prefs.")],
+    list(DEMO_VAULT_DATA),
+)
+app.state.sign_pool = ThreadPoolExecutor(max_workers=max(1, CONSENT_SIGN_WORKERS), thread_name_prefix="consent-sign")
+
+
+def _sweep_expired(now: Optional[float] = None) -> int:
+    due = app.state.expiry.pop_due(now, limit=SWEEP_BATCH)
+    with app.state.lock:
+        for jti in due:
+            app.state.consents.pop(jti, None)
+            app.state.revoked.discard(jti)
+    return len(due)
+
+
+async def _sweep_loop() -> None:
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_S)
+        while _sweep_expired() == SWEEP_BATCH:
+            await asyncio.sleep(0)
+        while app.state.idempotency.expire(limit=SWEEP_BATCH) == SWEEP_BATCH:
+            await asyncio.sleep(0)
+        app.state.keys.prune()
+
+
+async def _rotate_loop() -> None:
+    while True:
+        await asyncio.sleep(JWKS_ROTATE_INTERVAL_S)
+        app.state.keys.rotate()
 
 
 @app.get("/health")
@@ -131,11 +264,51 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@app.post("/consent/issue", response_model=ConsentIssueResponse)
-def issue_consent(request: ConsentIssueRequest) -> ConsentIssueResponse:
-    now = int(time.time())
+@app.get("/stats")
+def stats() -> Dict[str, object]:
+    with app.state.lock:
+        maps = {"consents": app.state.consents, "revoked": app.state.revoked}
+        state = {name: {"entries": len(value), "approx_bytes": sys.getsizeof(value)} for name, value in maps.items()}
+    return {
+        "state": state,
+        "expiry": app.state.expiry.stats(),
+        "idempotency": app.state.idempotency.stats(),
+        "token_cache": app.state.token_cache.stats(),
+        "vault_store": app.state.vault_store.stats(),
+        "change_feed": app.state.change_feed.stats(),
+        "signing_keys": app.state.keys.stats(),
+        "scope_registry": app.state.registry.stats(),
+    }
+
+
+def _token_subject(authorization: Optional[str]) -> str:
+    # Vault data is partitioned by subject; callers present the consent token as a bearer credential.
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="missing_bearer_token")
+    cached = app.state.token_cache.get(token)
+    payload = cached[0] if cached is not None else None
+    if payload is None:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = app.state.keys.public_key(kid) if kid else None
+            if key is None:
+                raise jwt.InvalidTokenError("unknown_kid")
+            payload = jwt.decode(token, key, algorithms=["EdDSA"], audience=AUDIENCE)
+        except Exception as exc:
+            raise HTTPException(status_code=401, detail=f"invalid_token: {exc}") from exc
+        app.state.token_cache.put(token, payload)
+    if payload.get("jti") in app.state.revoked:
+        raise HTTPException(status_code=403, detail="revoked")
+    subject = payload.get("sub")
+    if not subject:
+        raise HTTPException(status_code=401, detail="missing_sub")
+    return str(subject)
+
+
+def _consent_payload(request: ConsentIssueRequest, now: int) -> Dict[str, object]:
     jti = f"ctok_{uuid.uuid4().hex[:8]}"
-    payload = {
+    payload: Dict[str, object] = {
         "iss": ISSUER_DID,
         "sub": request.sub,
         "act": request.act,
@@ -149,36 +322,266 @@ def issue_consent(request: ConsentIssueRequest) -> ConsentIssueResponse:
         "nbf": now,
         "exp": now + request.ttl_seconds,
     }
-    token = jwt.encode(
+    if request.compact:
+        # A full registry leaves the token with its string lists; verifiers accept both forms.
+        compact = app.state.registry.encode(request.scp, request.res)
+        if compact is not None:
+            del payload["scp"], payload["res"]
+            payload.update(compact)
+    return payload
+
+
+def _sign(payload: Dict[str, object]) -> str:
+    kid, key = app.state.keys.active()
+    return jwt.encode(
         payload,
-        app.state.signing_key,
+        key,
         algorithm="EdDSA",
-        headers={"kid": JWKS_KID, "typ": "JWT"},
+        headers={"kid": kid, "typ": "JWT"},
     )
-    app.state.consents[jti] = payload
-    return ConsentIssueResponse(token=token, jti=jti, expires_at=payload["exp"], payload=payload)
+
+
+def _issue_chunk(
+    items: List[Tuple[int, Dict[str, Any]]], now: int
+) -> List[Tuple[int, Optional[Dict[str, object]], Optional[str], Optional[str]]]:
+    # Validates, builds and signs each item; returns (index, payload, token, error) and one
+    # failure, at any step, only fails its own item.
+    issued = []
+    for index, item in items:
+        try:
+            payload = _consent_payload(ConsentIssueRequest.model_validate(item), now)
+            issued.append((index, payload, _sign(payload), None))
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            )
+            issued.append((index, None, None, f"invalid_request: {detail}"))
+        except Exception as exc:
+            issued.append((index, None, None, f"issue_failed: {exc}"))
+    return issued
+
+
+def _register_consents(payloads: List[Dict[str, object]]) -> None:
+    with app.state.lock:
+        for payload in payloads:
+            app.state.consents[payload["jti"]] = payload
+    for payload in payloads:
+        app.state.expiry.schedule(payload["jti"], float(payload["exp"]))
+
+
+@app.post("/consent/issue", response_model=ConsentIssueResponse)
+def issue_consent(request: ConsentIssueRequest) -> ConsentIssueResponse:
+    payload = _consent_payload(request, int(time.time()))
+    token = _sign(payload)
+    _register_consents([payload])
+    return ConsentIssueResponse(token=token, jti=payload["jti"], expires_at=payload["exp"], payload=payload)
+
+
+@app.post("/consent/issue_batch", response_model=ConsentIssueBatchResponse)
+async def issue_consent_batch(request: ConsentIssueBatchRequest) -> ConsentIssueBatchResponse:
+    now = int(time.time())
+    results: List[ConsentIssueBatchItem] = []
+    items = list(enumerate(request.items))
+
+    # Validate and sign off the event loop, in one contiguous chunk per worker to keep executor overhead small.
+    loop = asyncio.get_running_loop()
+    workers = max(1, min(CONSENT_SIGN_WORKERS, len(items)))
+    size = -(-len(items) // workers)
+    chunks = [items[start : start + size] for start in range(0, len(items), size)]
+    done = await asyncio.gather(
+        *(loop.run_in_executor(app.state.sign_pool, _issue_chunk, chunk, now) for chunk in chunks)
+    )
+
+    issued: List[Dict[str, object]] = []
+    for chunk in done:
+        for index, payload, token, error in chunk:
+            if payload is None or token is None:
+                results.append(ConsentIssueBatchItem(index=index, ok=False, error=error))
+                continue
+            issued.append(payload)
+            results.append(
+                ConsentIssueBatchItem(
+                    index=index,
+                    ok=True,
+                    result=ConsentIssueResponse(token=token, jti=payload["jti"], expires_at=payload["exp"], payload=payload),
+                )
+            )
+    _register_consents(issued)
+    results.sort(key=lambda item: item.index)
+    return ConsentIssueBatchResponse(results=results, issued=len(issued), failed=len(results) - len(issued))
+
+
+@app.get("/consent/registry")
+def consent_registry() -> Dict[str, object]:
+    return app.state.registry.snapshot()
+
+
+@app.get("/consent/registry/{version}")
+def consent_registry_version(version: int, response: Response) -> Dict[str, object]:
+    snapshot = app.state.registry.snapshot(version)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="unknown_registry_version")
+    # A published version never changes.
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    response.headers["ETag"] = '"%s"' % snapshot["digest"]
+    return snapshot
 
 
 @app.get("/.well-known/jwks.json")
-def jwks() -> Dict[str, List[Dict[str, str]]]:
-    return app.state.jwks
+def jwks(response: Response) -> Dict[str, List[Dict[str, str]]]:
+    # The next key is published a full rotation ahead, so verifiers can cache this freely.
+    response.headers["Cache-Control"] = f"public, max-age={JWKS_CACHE_MAX_AGE_S}"
+    return app.state.keys.jwks()
+
+
+def _require_admin(token: Optional[str]) -> None:
+    if not VAULT_ADMIN_TOKEN or not token or not hmac.compare_digest(token, VAULT_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="admin_token_required")
+
+
+@app.post("/keys/rotate")
+def rotate_keys(x_admin_token: Optional[str] = Header(None)) -> Dict[str, object]:
+    _require_admin(x_admin_token)
+    if not JWKS_KEY_STORE:
+        # An in-memory rotation is lost on restart, along with every token signed by the new key.
+        raise HTTPException(status_code=409, detail="key_store_required")
+    kid = app.state.keys.rotate()
+    return {"active_kid": kid, "jwks": app.state.keys.jwks()}
 
 
 @app.post("/revoke")
 def revoke(request: RevokeRequest) -> Dict[str, str]:
-    if request.jti not in app.state.consents:
-        raise HTTPException(status_code=404, detail="unknown token")
-    app.state.revoked.add(request.jti)
-    return {"status": "revoked", "jti": request.jti}
+    response = {"status": "revoked", "jti": request.jti}
+    if request.idempotency_key:
+        cached = app.state.idempotency.claim(request.idempotency_key, response, time.time() + IDEMPOTENCY_TTL_S)
+        if cached is not None:
+            return cached
+    with app.state.lock:
+        if request.jti not in app.state.consents:
+            # Failures are not remembered, so a retry after the consent exists can still succeed.
+            if request.idempotency_key:
+                app.state.idempotency.release(request.idempotency_key)
+            raise HTTPException(status_code=404, detail="unknown token")
+        app.state.revoked.add(request.jti)
+    return response
+
+
+def _etag(subject: str, versions: Dict[str, int]) -> str:
+    # Versions only ever increase, so (key, version) pairs identify the response body.
+    digest = hashlib.sha256(subject.encode("utf-8"))
+    for key, version in versions.items():
+        digest.update(b"\0%s:%d" % (key.encode("utf-8"), version))
+    return '"%s"' % digest.hexdigest()[:32]
 
 
 @app.post("/vault/read", response_model=VaultReadResponse)
-def vault_read(request: VaultReadRequest) -> VaultReadResponse:
-    values = {key: app.state.vault_data.get(key) for key in request.keys}
-    return VaultReadResponse(values=values)
+async def vault_read(
+    request: VaultReadRequest,
+    response: Response,
+    authorization: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    subject = _token_subject(authorization)
+    items = await app.state.vault_store.get_many(subject, request.keys)
+    versions = {key: item.version if item is not None else 0 for key, item in items.items()}
+    etag = _etag(subject, versions)
+    if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    values = {key: item.value if item is not None else None for key, item in items.items()}
+    return VaultReadResponse(values=values, versions=versions)
+
+
+@app.post("/vault/scan", response_model=VaultScanResponse)
+async def vault_scan(
+    request: VaultScanRequest, authorization: Optional[str] = Header(None)
+) -> VaultScanResponse:
+    subject = _token_subject(authorization)
+    items, next_cursor = await app.state.vault_store.scan(
+        subject,
+        prefix=request.prefix,
+        start_after=request.start_after,
+        end=request.end,
+        limit=request.limit,
+    )
+    return VaultScanResponse(
+        values={key: item.value for key, item in items.items()},
+        versions={key: item.version for key, item in items.items()},
+        next_cursor=next_cursor,
+    )
 
 
 @app.post("/vault/write", response_model=VaultWriteResponse)
-def vault_write(request: VaultWriteRequest) -> VaultWriteResponse:
-    app.state.vault_data.update(request.updates)
-    return VaultWriteResponse(updated_keys=list(request.updates.keys()))
+async def vault_write(
+    request: VaultWriteRequest, authorization: Optional[str] = Header(None)
+) -> VaultWriteResponse:
+    subject = _token_subject(authorization)
+    try:
+        versions = await app.state.vault_store.put_many(subject, request.updates, request.expected_versions)
+    except VersionConflict as exc:
+        raise HTTPException(
+            status_code=409, detail={"error": "version_conflict", "current_versions": exc.current}
+        ) from exc
+    app.state.change_feed.publish(subject, versions)
+    return VaultWriteResponse(updated_keys=list(request.updates.keys()), versions=versions)
+
+
+def _feed_subject(authorization: Optional[str], x_admin_token: Optional[str]) -> Optional[str]:
+    # Services keeping caches across subjects authenticate with the admin token and get every
+    # subject's changes; a consent bearer token only ever sees its own subject.
+    if x_admin_token is not None:
+        _require_admin(x_admin_token)
+        return None
+    return _token_subject(authorization)
+
+
+@app.get("/vault/changes", response_model=VaultChangesResponse)
+async def vault_changes(
+    since: Optional[int] = Query(None, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    wait_s: float = Query(0.0, ge=0.0),
+    authorization: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+) -> VaultChangesResponse:
+    # Long-poll: without a cursor, start from the current head and wait for the next write.
+    subject = _feed_subject(authorization, x_admin_token)
+    feed = app.state.change_feed
+    cursor = feed.last_seq if since is None else since
+    deadline = time.monotonic() + min(wait_s, CHANGE_FEED_MAX_WAIT_S)
+    while True:
+        changes, cursor, truncated = feed.read(cursor, subject, limit)
+        if changes or truncated:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not await feed.wait(cursor, remaining):
+            break
+    return VaultChangesResponse(changes=changes, next_cursor=cursor, truncated=truncated)
+
+
+@app.get("/vault/changes/stream")
+async def vault_changes_stream(
+    since: Optional[int] = Query(None, ge=0),
+    authorization: Optional[str] = Header(None),
+    last_event_id: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+) -> StreamingResponse:
+    subject = _feed_subject(authorization, x_admin_token)
+    feed = app.state.change_feed
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    start = feed.last_seq if since is None else since
+
+    async def events() -> AsyncIterator[str]:
+        cursor = start
+        while True:
+            changes, cursor, truncated = feed.read(cursor, subject, limit=500)
+            if truncated:
+                yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+            for change in changes:
+                yield f"id: {change['seq']}\nevent: change\ndata: {json.dumps(change)}\n\n"
+            if not changes and not await feed.wait(cursor, CHANGE_FEED_KEEPALIVE_S):
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _b64url_encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _bitmap(indexes: Iterable[int]) -> str:
+    bits = 0
+    for index in indexes:
+        bits |= 1 << index
+    return _b64url_encode(bits.to_bytes((bits.bit_length() + 7) // 8 or 1, "little"))
+
+
+class ScopeRegistry:
+    """Append-only dictionary of scope and resource strings for compact tokens.
+
+    Each version is a prefix of both lists, so an index never changes meaning
+    and every published version is immutable. Each version also has a content
+    digest; tokens carry it so a verifier can reject a bitmap encoded against
+    a registry it does not have (for example after the vault restarted with a
+    differently ordered registry).
+
+    With ``path`` set every new version is appended there as one JSON line of
+    the strings it added and replayed on start, so versions (and the tokens
+    encoded against them) survive a restart. Callers supply the strings, so
+    the registry stops growing at ``max_entries``; ``encode`` then returns
+    None and the token keeps its string lists.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 10000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._scopes: List[str] = []
+        self._resources: List[str] = []
+        self._scope_index: Dict[str, int] = {}
+        self._resource_index: Dict[str, int] = {}
+        # version -> (scope count, resource count, digest); version 0 is empty.
+        self._versions: List[Tuple[int, int, str]] = [(0, 0, hashlib.sha256(b"").hexdigest()[:16])]
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        good = 0
+        with open(self.path, "rb") as fh:
+            for line in fh:
+                try:
+                    added = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    added = None
+                if added is None:
+                    break
+                self._add(added["scopes"], added["resources"])
+                good += len(line)
+        # Drop a torn last line so the next append starts on a line boundary.
+        if good < os.path.getsize(self.path):
+            with open(self.path, "r+b") as fh:
+                fh.truncate(good)
+
+    def _add(self, scopes: List[str], resources: List[str]) -> None:
+        # Caller holds self._lock (or is loading); ``scopes``/``resources`` are all new.
+        for value in scopes:
+            self._scope_index[value] = len(self._scopes)
+            self._scopes.append(value)
+        for value in resources:
+            self._resource_index[value] = len(self._resources)
+            self._resources.append(value)
+        digest = hashlib.sha256(
+            "\n".join(self._scopes).encode("utf-8") + b"\0" + "\n".join(self._resources).encode("utf-8")
+        ).hexdigest()[:16]
+        self._versions.append((len(self._scopes), len(self._resources), digest))
+
+    @property
+    def version(self) -> int:
+        return len(self._versions) - 1
+
+    def register(self, scopes: Iterable[str], resources: Iterable[str]) -> Optional[int]:
+        """Add unknown strings and return the first version that covers all of them; None if full."""
+        with self._lock:
+            new_scopes = [value for value in dict.fromkeys(scopes) if value not in self._scope_index]
+            new_resources = [value for value in dict.fromkeys(resources) if value not in self._resource_index]
+            if new_scopes or new_resources:
+                size = len(self._scopes) + len(self._resources) + len(new_scopes) + len(new_resources)
+                if size > self.max_entries:
+                    return None
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as fh:
+                        fh.write(json.dumps({"scopes": new_scopes, "resources": new_resources}) + "\n")
+                        fh.flush()
+                        os.fsync(fh.fileno())
+                self._add(new_scopes, new_resources)
+            return len(self._versions) - 1
+
+    def encode(self, scopes: List[str], resources: List[str]) -> Optional[Dict[str, object]]:
+        """Compact claims replacing ``scp``/``res`` in a token payload; None once the registry is full."""
+        version = self.register(scopes, resources)
+        if version is None:
+            return None
+        with self._lock:
+            return {
+                "reg": version,
+                "rgh": self._versions[version][2],
+                "scpb": _bitmap(self._scope_index[value] for value in scopes),
+                "resb": _bitmap(self._resource_index[value] for value in resources),
+            }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "version": len(self._versions) - 1,
+                "entries": len(self._scopes) + len(self._resources),
+                "max_entries": self.max_entries,
+            }
+
+    def snapshot(self, version: Optional[int] = None) -> Optional[Dict[str, object]]:
+        with self._lock:
+            version = len(self._versions) - 1 if version is None else version
+            if not 0 <= version < len(self._versions):
+                return None
+            scope_count, resource_count, digest = self._versions[version]
+            return {
+                "version": version,
+                "digest": digest,
+                "scopes": self._scopes[:scope_count],
+                "resources": self._resources[:resource_count],
+            }
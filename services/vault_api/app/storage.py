@@ -0,0 +1,452 @@
+import asyncio
+import bisect
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class VaultItem(NamedTuple):
+    value: str
+    version: int
+
+
+class VersionConflict(Exception):
+    """Raised by put_many when an expected version does not match; nothing is written."""
+
+    def __init__(self, current: Dict[str, int]) -> None:
+        super().__init__("version_conflict")
+        self.current = current
+
+
+def _check_versions(expected: Optional[Dict[str, int]], current: Dict[str, int]) -> None:
+    # Version 0 means "must not exist yet".
+    if expected and any(current.get(key, 0) != version for key, version in expected.items()):
+        raise VersionConflict({key: current.get(key, 0) for key in expected})
+
+
+class VaultStore(ABC):
+    """Per-subject key/value storage behind /vault/read and /vault/write.
+
+    Every operation is scoped to one subject DID. Backends must answer a
+    whole batch of keys with a single lookup. Each key carries a version that
+    starts at 1 and increases by one on every write.
+    """
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get_many(self, subject: str, keys: List[str]) -> Dict[str, Optional[VaultItem]]:
+        ...
+
+    @abstractmethod
+    async def put_many(
+        self, subject: str, updates: Dict[str, str], expected: Optional[Dict[str, int]] = None
+    ) -> Dict[str, int]:
+        """Write ``updates`` atomically and return the new version of each key.
+
+        With ``expected`` (key -> version, 0 for absent) the write is a
+        compare-and-swap: on any mismatch VersionConflict is raised.
+        """
+
+    @abstractmethod
+    async def scan(
+        self,
+        subject: str,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 100,
+    ) -> Tuple[Dict[str, VaultItem], Optional[str]]:
+        """Return up to ``limit`` keys in key order that start with ``prefix``.
+
+        ``start_after`` is an exclusive lower bound (the previous page's cursor)
+        and ``end`` an exclusive upper bound. The second element is the cursor
+        for the next page, or None when the range is exhausted.
+        """
+
+    async def seed(self, subject: str, data: Dict[str, str]) -> None:
+        """Insert ``data`` for keys the subject does not have yet."""
+        existing = await self.get_many(subject, list(data))
+        missing = {key: value for key, value in data.items() if existing.get(key) is None}
+        if missing:
+            await self.put_many(subject, missing)
+
+    def stats(self) -> Dict[str, object]:
+        return {}
+
+
+def _range_bounds(prefix: str, start_after: Optional[str], end: Optional[str]) -> Tuple[str, Optional[str]]:
+    # Converts a prefix scan into a [lower, upper) key range for index lookups.
+    upper = end
+    if prefix:
+        successor = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        upper = successor if upper is None else min(upper, successor)
+    lower = prefix if start_after is None else max(prefix, start_after)
+    return lower, upper
+
+
+class _Shape:
+    """An interned, ordered set of key names shared by every subject that has exactly those keys."""
+
+    __slots__ = ("keys", "index", "transitions", "_sorted")
+
+    def __init__(self, keys: Tuple[str, ...]) -> None:
+        self.keys = keys
+        self.index: Dict[str, int] = {key: position for position, key in enumerate(keys)}
+        self.transitions: Dict[str, "_Shape"] = {}
+        self._sorted: Optional[List[str]] = None
+
+    def sorted_keys(self) -> List[str]:
+        # Built once per shape and shared by every subject on it.
+        if self._sorted is None:
+            self._sorted = sorted(self.keys)
+        return self._sorted
+
+    def with_key(self, key: str) -> "_Shape":
+        shape = self.transitions.get(key)
+        if shape is None:
+            shape = self.transitions[key] = _Shape(self.keys + (sys.intern(key),))
+        return shape
+
+
+class _Record:
+    __slots__ = ("shape", "values", "versions")
+
+    def __init__(self, shape: _Shape) -> None:
+        self.shape = shape
+        self.values: List[str] = []
+        self.versions = array("Q")
+
+
+class MemoryStore(VaultStore):
+    """Process-local store for tests and the demo.
+
+    Subjects with the same fields share one ``_Shape`` (key name -> slot), so
+    each subject costs a single values list rather than its own dict of key
+    strings. Reads are two dict probes and a list index.
+    """
+
+    def __init__(self) -> None:
+        self._root = _Shape(())
+        self._subjects: Dict[str, _Record] = {}
+        self._lock = threading.Lock()
+
+    async def get_many(self, subject: str, keys: List[str]) -> Dict[str, Optional[VaultItem]]:
+        record = self._subjects.get(subject)
+        if record is None:
+            return {key: None for key in keys}
+        shape, values, versions = record.shape, record.values, record.versions
+        result: Dict[str, Optional[VaultItem]] = {}
+        for key in keys:
+            position = shape.index.get(key)
+            result[key] = VaultItem(values[position], versions[position]) if position is not None else None
+        return result
+
+    async def scan(
+        self,
+        subject: str,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 100,
+    ) -> Tuple[Dict[str, VaultItem], Optional[str]]:
+        record = self._subjects.get(subject)
+        if record is None:
+            return {}, None
+        shape, values, versions = record.shape, record.values, record.versions
+        keys = shape.sorted_keys()
+        lower, upper = _range_bounds(prefix, start_after, end)
+        position = bisect.bisect_left(keys, lower)
+        if start_after is not None and position < len(keys) and keys[position] == start_after:
+            position += 1
+        stop = len(keys) if upper is None else bisect.bisect_left(keys, upper)
+        page_end = min(stop, position + limit)
+        page = {}
+        for key in keys[position:page_end]:
+            slot = shape.index[key]
+            page[key] = VaultItem(values[slot], versions[slot])
+        cursor = keys[page_end - 1] if page_end < stop and page else None
+        return page, cursor
+
+    async def put_many(
+        self, subject: str, updates: Dict[str, str], expected: Optional[Dict[str, int]] = None
+    ) -> Dict[str, int]:
+        with self._lock:
+            record = self._subjects.get(subject)
+            if expected:
+                current: Dict[str, int] = {}
+                if record is not None:
+                    for key in expected:
+                        position = record.shape.index.get(key)
+                        if position is not None:
+                            current[key] = record.versions[position]
+                _check_versions(expected, current)
+            if record is None:
+                record = self._subjects[subject] = _Record(self._root)
+            written: Dict[str, int] = {}
+            for key, value in updates.items():
+                position = record.shape.index.get(key)
+                if position is None:
+                    # Append before publishing the wider shape so lock-free readers never over-index.
+                    record.values.append(value)
+                    record.versions.append(1)
+                    record.shape = record.shape.with_key(key)
+                    written[key] = 1
+                else:
+                    record.values[position] = value
+                    record.versions[position] += 1
+                    written[key] = record.versions[position]
+            return written
+
+    def stats(self) -> Dict[str, object]:
+        shapes = 0
+        pending = [self._root]
+        while pending:
+            shape = pending.pop()
+            shapes += 1
+            pending.extend(shape.transitions.values())
+        return {"backend": "memory", "subjects": len(self._subjects), "shapes": shapes}
+
+
+class SQLiteStore(VaultStore):
+    """Embedded single-node backend; WAL lets reads proceed alongside a writer."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS vault_items ("
+            " user_did TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 1,"
+            " updated_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now')),"
+            " PRIMARY KEY (user_did, key)"
+            ") WITHOUT ROWID"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(vault_items)")}
+        if "version" not in columns:
+            conn.execute("ALTER TABLE vault_items ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self._conn = conn
+
+    async def open(self) -> None:
+        await asyncio.to_thread(self._connect)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _select(self, subject: str, keys: List[str]) -> Dict[str, VaultItem]:
+        found: Dict[str, VaultItem] = {}
+        # Stay under SQLite's bound-parameter limit on very large batches.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT key, value, version FROM vault_items WHERE user_did = ? AND key IN ({placeholders})",
+                [subject, *chunk],
+            ).fetchall()
+            found.update((key, VaultItem(value, version)) for key, value, version in rows)
+        return found
+
+    def _get_many(self, subject: str, keys: List[str]) -> Dict[str, Optional[VaultItem]]:
+        with self._lock:
+            found = self._select(subject, keys)
+        return {key: found.get(key) for key in keys}
+
+    def _scan(
+        self, subject: str, prefix: str, start_after: Optional[str], end: Optional[str], limit: int
+    ) -> Tuple[Dict[str, VaultItem], Optional[str]]:
+        lower, upper = _range_bounds(prefix, start_after, end)
+        sql = "SELECT key, value, version FROM vault_items WHERE user_did = ? AND key >= ?"
+        params: List[object] = [subject, lower]
+        if start_after is not None:
+            sql += " AND key > ?"
+            params.append(start_after)
+        if upper is not None:
+            sql += " AND key < ?"
+            params.append(upper)
+        sql += " ORDER BY key LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        page = {key: VaultItem(value, version) for key, value, version in rows[:limit]}
+        return page, rows[limit - 1][0] if len(rows) > limit else None
+
+    def _put_many(
+        self, subject: str, updates: Dict[str, str], expected: Optional[Dict[str, int]]
+    ) -> Dict[str, int]:
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so the version check and the write are atomic.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if expected:
+                    current = self._select(subject, list(expected))
+                    _check_versions(expected, {key: item.version for key, item in current.items()})
+                self._conn.executemany(
+                    "INSERT INTO vault_items (user_did, key, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_did, key) DO UPDATE SET value = excluded.value, "
+                    "version = vault_items.version + 1, updated_at = strftime('%s', 'now')",
+                    [(subject, key, value) for key, value in updates.items()],
+                )
+                written = {key: item.version for key, item in self._select(subject, list(updates)).items()}
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return written
+
+    async def get_many(self, subject: str, keys: List[str]) -> Dict[str, Optional[VaultItem]]:
+        if not keys:
+            return {}
+        return await asyncio.to_thread(self._get_many, subject, keys)
+
+    async def scan(
+        self,
+        subject: str,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 100,
+    ) -> Tuple[Dict[str, VaultItem], Optional[str]]:
+        return await asyncio.to_thread(self._scan, subject, prefix, start_after, end, limit)
+
+    async def put_many(
+        self, subject: str, updates: Dict[str, str], expected: Optional[Dict[str, int]] = None
+    ) -> Dict[str, int]:
+        if not updates:
+            return {}
+        return await asyncio.to_thread(self._put_many, subject, updates, expected)
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "sqlite", "path": self.path}
+
+
+class PostgresStore(VaultStore):
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10) -> None:
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+
+    async def open(self) -> None:
+        try:
+            import asyncpg
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError("asyncpg is required for postgresql:// vault stores") from exc
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        async with self._pool.acquire() as conn:
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS vault_items ("
+                " user_did TEXT NOT NULL,"
+                # Byte-order collation keeps range scans consistent with the other backends.
+                " key TEXT COLLATE \"C\" NOT NULL,"
+                " value TEXT NOT NULL,"
+                " version BIGINT NOT NULL DEFAULT 1,"
+                " updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),"
+                " PRIMARY KEY (user_did, key)"
+                ")"
+            )
+            await conn.execute("ALTER TABLE vault_items ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1")
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def get_many(self, subject: str, keys: List[str]) -> Dict[str, Optional[VaultItem]]:
+        items: Dict[str, Optional[VaultItem]] = {key: None for key in keys}
+        if not keys:
+            return items
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT key, value, version FROM vault_items WHERE user_did = $1 AND key = ANY($2::text[])",
+                subject,
+                keys,
+            )
+        items.update((row["key"], VaultItem(row["value"], row["version"])) for row in rows)
+        return items
+
+    async def scan(
+        self,
+        subject: str,
+        prefix: str = "",
+        start_after: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 100,
+    ) -> Tuple[Dict[str, VaultItem], Optional[str]]:
+        lower, upper = _range_bounds(prefix, start_after, end)
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT key, value, version FROM vault_items "
+                "WHERE user_did = $1 AND key >= $2 "
+                "AND ($3::text IS NULL OR key > $3) AND ($4::text IS NULL OR key < $4) "
+                "ORDER BY key LIMIT $5",
+                subject,
+                lower,
+                start_after,
+                upper,
+                limit + 1,
+            )
+        page = {row["key"]: VaultItem(row["value"], row["version"]) for row in rows[:limit]}
+        return page, rows[limit - 1]["key"] if len(rows) > limit else None
+
+    async def put_many(
+        self, subject: str, updates: Dict[str, str], expected: Optional[Dict[str, int]] = None
+    ) -> Dict[str, int]:
+        if not updates:
+            return {}
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                # Every writer takes the per-subject lock, so no blind write can land between a CAS
+                # check and its upsert; row locks alone would miss keys that do not exist yet.
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", subject)
+                if expected:
+                    rows = await conn.fetch(
+                        "SELECT key, version FROM vault_items WHERE user_did = $1 AND key = ANY($2::text[])",
+                        subject,
+                        list(expected),
+                    )
+                    _check_versions(expected, {row["key"]: row["version"] for row in rows})
+                rows = await conn.fetch(
+                    "INSERT INTO vault_items (user_did, key, value) "
+                    "SELECT $1, * FROM unnest($2::text[], $3::text[]) "
+                    "ON CONFLICT (user_did, key) DO UPDATE SET value = excluded.value, "
+                    "version = vault_items.version + 1, updated_at = now() "
+                    "RETURNING key, version",
+                    subject,
+                    list(updates.keys()),
+                    list(updates.values()),
+                )
+        return {row["key"]: row["version"] for row in rows}
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "postgresql", "pool_max": self.max_size}
+
+
+def create_store(url: str, pool_min: int = 1, pool_max: int = 10) -> VaultStore:
+    """Build a store from ``memory://``, ``sqlite:///path/to.db`` or ``postgresql://...``."""
+    scheme = urlparse(url).scheme if url else "memory"
+    if scheme == "memory":
+        return MemoryStore()
+    if scheme == "sqlite":
+        # sqlite:///relative.db or sqlite:////absolute/path.db
+        return SQLiteStore(url[len("sqlite:///") :])
+    if scheme in ("postgres", "postgresql"):
+        return PostgresStore(url, min_size=pool_min, max_size=pool_max)
+    raise ValueError(f"unsupported vault store url: {url}")